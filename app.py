@@ -1,40 +1,191 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import click
 from flask import Flask, render_template
-from config import Config
-from routes.auth_routes import auth_bp
-from routes.inventory_routes import inventory_bp
-from routes.recipe_routes import recipe_bp
-from routes.meal_plan_routes import meal_plan_bp
-from database.mongo_setup import init_mongo
-from database.mysql_setup import init_mysql, create_tables
 from flask_login import LoginManager
-from models.user import User
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize databases
-mongo_db = init_mongo(app)
-mysql_db = init_mysql(app)
-create_tables()
+from config import Config
 
-# Setup login manager
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get_by_id(user_id)
+    from models.user import User
+    return User.load_cached(user_id)
+
+def create_app(config_object=Config):
+    """
+    Build the Flask application
+
+    Startup only wires things together: no database is contacted and no
+    schema is touched. Mongo and MySQL clients are created on first use in
+    each process, so a gunicorn master can preload the app and fork workers
+    safely. Create the schema and seed data with ``flask --app app init-db``.
+
+    Args:
+        config_object: Class or object holding the settings
+
+    Returns:
+        Flask: The configured application
+    """
+    started = time.perf_counter()
+
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+
+    # Profiling turns on query instrumentation, so it goes before the database setup
+    from database.profiler import init_profiler
+    init_profiler(app)
+
+    # Only record settings; connections open lazily
+    from database.mongo_setup import init_mongo
+    from database.mysql_setup import init_mysql
+    init_mongo(app)
+    init_mysql(app)
+
+    # Setup login manager
+    login_manager.init_app(app)
+
+    # Register blueprints
+    from routes.auth_routes import auth_bp
+    from routes.inventory_routes import inventory_bp
+    from routes.recipe_routes import recipe_bp
+    from routes.meal_plan_routes import meal_plan_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(inventory_bp)
+    app.register_blueprint(recipe_bp)
+    app.register_blueprint(meal_plan_bp)
+
+    # Drop stale recipe cache entries when other processes edit recipes
+    if app.config['RECIPE_CACHE_WATCH']:
+        _start_change_listener_per_process(app)
+
+    @app.route('/')
+    def index():
+        return render_template('index.html')
+
+    _register_commands(app)
+
+    boot_ms = (time.perf_counter() - started) * 1000
+    app.config['BOOT_TIME_MS'] = boot_ms
+    if boot_ms > app.config['BOOT_TIME_BUDGET_MS']:
+        app.logger.warning(
+            "App startup took %.0f ms, over the %.0f ms budget",
+            boot_ms, app.config['BOOT_TIME_BUDGET_MS']
+        )
+
+    return app
+
+def _start_change_listener_per_process(app):
+    # Threads don't survive a fork, so each worker starts its own listener
+    started_in = set()
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_change_listener():
+        pid = os.getpid()
+        if pid in started_in:
+            return
+        with lock:
+            if pid not in started_in:
+                from models.recipe import Recipe
+                Recipe.start_change_listener()
+                started_in.add(pid)
+
+def _register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the MySQL database and tables, apply migrations and seed Mongo."""
+        from database.mysql_setup import create_database, create_tables
+        from database.mongo_setup import seed_database
+        from database.migrations import run_migrations
+
+        if not create_database(app.config):
+            raise click.ClickException("Could not create the MySQL database.")
+        create_tables()
+        for description in run_migrations():
+            click.echo(f"Applied {description}")
+        for collection in seed_database():
+            click.echo(f"Seeded {collection}")
+        click.echo("Database is ready.")
+
+    @app.cli.command('seed')
+    def seed_command():
+        """Seed recipes and ingredients into empty Mongo collections."""
+        from database.mongo_setup import seed_database
+
+        seeded = seed_database()
+        for collection in seeded:
+            click.echo(f"Seeded {collection}")
+        if not seeded:
+            click.echo("Collections already have data.")
+
+    @app.cli.command('ingest-recipes')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', type=int, default=None, help="Documents per bulk write (INGEST_BATCH_SIZE).")
+    @click.option('--workers', type=int, default=None, help="Batches written concurrently (INGEST_WORKERS).")
+    @click.option('--restart', is_flag=True, help="Ignore a saved checkpoint and start from the first record.")
+    def ingest_recipes_command(path, batch_size, workers, restart):
+        """Stream a JSONL or CSV recipe catalog into Mongo, resuming after a failure."""
+        from database.ingest import ingest_recipes
+
+        checkpoint_path = path + '.checkpoint'
+        if restart and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        stats = ingest_recipes(
+            path,
+            batch_size=batch_size,
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+            report=lambda stats: click.echo(str(stats)),
+            on_invalid=lambda position, error: click.echo(f"Skipped record {position}: {error}", err=True)
+        )
+        if stats.skipped:
+            click.echo(f"Resumed after {stats.skipped} records already ingested.")
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending MySQL and Mongo index migrations."""
+        from database.migrations import run_migrations
+
+        applied = run_migrations()
+        for description in applied:
+            click.echo(f"Applied {description}")
+        if not applied:
+            click.echo("Database is up to date.")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """EXPLAIN hot queries and fail if any needs a full scan."""
+        from database.migrations import verify_query_plans
+
+        verify_query_plans()
+        click.echo("All hot queries use an index.")
 
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(inventory_bp)
-app.register_blueprint(recipe_bp)
-app.register_blueprint(meal_plan_bp)
+    @app.cli.command('check-boot-time')
+    def check_boot_time_command():
+        """Time a cold import of the app in a fresh process and fail over budget."""
+        script = (
+            "import time; started = time.perf_counter(); import app; "
+            "print((time.perf_counter() - started) * 1000)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        )
+        boot_ms = float(result.stdout.strip().splitlines()[-1])
+        budget_ms = app.config['BOOT_TIME_BUDGET_MS']
+        if boot_ms > budget_ms:
+            raise click.ClickException(f"Cold start took {boot_ms:.0f} ms, over the {budget_ms:.0f} ms budget.")
+        click.echo(f"Cold start took {boot_ms:.0f} ms (budget {budget_ms:.0f} ms).")
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from benchmarks.data import generate
+from config import Config
+from models.completed_recipe import CompletedRecipe
+from models.ingredient_index import IngredientIndex
+from models.inventory import Inventory
+from models.meal_plan import MealPlan
+from models.planner import plan_week
+from models.recipe import Recipe
+
+class Case:
+    """
+    One benchmarked call
+
+    ``call(ctx, i)`` performs iteration ``i``. Model cases run inside a fresh
+    app context per call, like a request would; route cases return the
+    test client's response.
+    """
+
+    def __init__(self, name, kind, call, mutates=False):
+        self.name = name
+        self.kind = kind
+        self.call = call
+        self.mutates = mutates
+
+class Context:
+    """Ids and per-user data the cases pick their arguments from"""
+
+    def __init__(self, dataset, loaded):
+        self.user_ids = loaded["user_ids"]
+        self.recipe_ids = loaded["recipe_ids"]
+        self.plan_ids = loaded["plan_ids"]
+        self.inventory_names = [set() for _ in self.user_ids]
+        for user, name, *_ in dataset.inventory:
+            self.inventory_names[user].add(name)
+
+    def user(self, i):
+        return self.user_ids[i % len(self.user_ids)]
+
+    def names(self, i):
+        return self.inventory_names[i % len(self.user_ids)]
+
+    def plan(self, i):
+        return self.plan_ids[i % len(self.plan_ids)]
+
+    def recipe(self, i):
+        # Stride through the catalog so consecutive calls hit different documents
+        return self.recipe_ids[(i * 7919) % len(self.recipe_ids)]
+
+def _week_start():
+    today = datetime.now().date()
+    return today - timedelta(days=today.weekday())
+
+def _plan_week(ctx, i):
+    # Same deadline as the generate route, started before the candidate lookup
+    deadline = time.perf_counter() + Config.MEAL_PLAN_DEADLINE_MS / 1000
+    candidates = Recipe.search_by_ingredients(ctx.names(i), limit=Config.MEAL_PLAN_CANDIDATES)
+    documents = Recipe.get_many(recipe['_id'] for recipe in candidates)
+    recipes = [documents[str(recipe['_id'])] for recipe in candidates if str(recipe['_id']) in documents]
+    return plan_week(recipes, ctx.names(i), Inventory.expiry_queue(ctx.user(i)).expiring(Config.EXPIRY_RANKING_DAYS),
+                     seed=i, deadline=deadline)
+
+class _Catalog:
+    """A generated recipe list standing in for the collection ``IngredientIndex.build`` reads"""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def find(self, query, projection):
+        return self
+
+    def sort(self, key, direction):
+        return iter(self.recipes)
+
+LARGE_CATALOG_RECIPES = 50000
+_large_catalog = {}
+
+def _plan_week_large(ctx, i):
+    # Ranks and plans against a 50k-recipe catalog held in memory, whatever
+    # size was loaded, so planner time at that scale is always measured
+    if not _large_catalog:
+        recipes = generate(users=1, items_per_user=1, recipes=LARGE_CATALOG_RECIPES, seed=7).recipes
+        for number, recipe in enumerate(recipes):
+            recipe['_id'] = ObjectId(number.to_bytes(12, 'big'))
+        _large_catalog['recipes'] = recipes
+        _large_catalog['index'] = IngredientIndex.build(_Catalog(recipes))
+
+    deadline = time.perf_counter() + Config.MEAL_PLAN_DEADLINE_MS / 1000
+    matches = _large_catalog['index'].top_matches(ctx.names(i), limit=Config.MEAL_PLAN_CANDIDATES)
+    recipes = [_large_catalog['recipes'][number] for number, _ in matches]
+    return plan_week(recipes, ctx.names(i), Inventory.expiry_queue(ctx.user(i)).expiring(Config.EXPIRY_RANKING_DAYS),
+                     seed=i, deadline=deadline)
+
+def _add_and_remove_item(ctx, i):
+    plan = MealPlan.add_item(ctx.plan(i), ctx.recipe(i), 6, 'snack')
+    added = [item for item in plan.items if item['meal_type'] == 'snack']
+    for item in added:
+        MealPlan.remove_item(item['id'])
+
+MODEL_CASES = [
+    Case("Recipe.get_by_id", "model", lambda ctx, i: Recipe.get_by_id(ctx.recipe(i))),
+    Case("Recipe.get_many", "model", lambda ctx, i: Recipe.get_many(ctx.recipe(i * 21 + j) for j in range(21))),
+    Case("Recipe.get_all", "model", lambda ctx, i: Recipe.get_all(limit=Config.RECIPE_PAGE_SIZE + 1)),
+    Case("Recipe.search_by_name", "model",
+         lambda ctx, i: Recipe.search_by_name("chicken", limit=Config.RECIPE_PAGE_SIZE + 1)),
+    Case("Recipe.search_by_ingredients", "model",
+         lambda ctx, i: Recipe.search_by_ingredients(ctx.names(i), limit=Config.RECIPE_PAGE_SIZE + 1)),
+    Case("Recipe.search_by_ingredients[boosted]", "model",
+         lambda ctx, i: Recipe.search_by_ingredients(
+             ctx.names(i),
+             limit=Config.RECIPE_PAGE_SIZE + 1,
+             boosts=Inventory.expiry_queue(ctx.user(i)).weights(Config.EXPIRY_RANKING_DAYS)
+         )),
+    Case("Recipe.match_ingredients", "model", lambda ctx, i: Recipe.match_ingredients(ctx.names(i))),
+    Case("Inventory.get_by_user_id", "model", lambda ctx, i: Inventory.get_by_user_id(ctx.user(i))),
+    Case("Inventory.snapshot", "model", lambda ctx, i: Inventory.snapshot(ctx.user(i))),
+    Case("Inventory.get_expiring_items", "model", lambda ctx, i: Inventory.get_expiring_items(ctx.user(i))),
+    Case("MealPlan.get_by_user", "model", lambda ctx, i: MealPlan.get_by_user(ctx.user(i), _week_start())),
+    Case("MealPlan.get_grocery_list", "model", lambda ctx, i: MealPlan.get_grocery_list(ctx.user(i), [ctx.plan(i)])),
+    Case("CompletedRecipe.get_by_user", "model", lambda ctx, i: CompletedRecipe.get_by_user(ctx.user(i), limit=20)),
+    Case("planner.plan_week", "model", _plan_week),
+    Case("planner.plan_week[50k catalog]", "model", _plan_week_large),
+    Case("MealPlan.add_item+remove_item", "model", _add_and_remove_item, mutates=True),
+    # Last: it deducts inventory, which changes what the read cases see
+    Case("CompletedRecipe.mark_completed", "model",
+         lambda ctx, i: CompletedRecipe.mark_completed(ctx.user(i), ctx.recipe(i), 1), mutates=True),
+]
+
+ROUTE_CASES = [
+    Case("GET /recipe/", "route", lambda ctx, i: "/recipe/"),
+    Case("GET /recipe/?sort=expiring", "route", lambda ctx, i: "/recipe/?sort=expiring"),
+    Case("GET /recipe/search", "route", lambda ctx, i: "/recipe/search?term=chicken"),
+    Case("GET /recipe/<id>", "route", lambda ctx, i: f"/recipe/{ctx.recipe(i)}"),
+    Case("GET /recipe/completed", "route", lambda ctx, i: "/recipe/completed"),
+    Case("GET /recipe/api/can-make", "route", lambda ctx, i: "/recipe/api/can-make"),
+    Case("GET /inventory/", "route", lambda ctx, i: "/inventory/"),
+    Case("GET /inventory/api/items", "route", lambda ctx, i: "/inventory/api/items"),
+    Case("GET /meal-plan/", "route", lambda ctx, i: "/meal-plan/"),
+    Case("GET /meal-plan/grocery-list", "route", lambda ctx, i: "/meal-plan/grocery-list"),
+    Case("GET /meal-plan/generate", "route", lambda ctx, i: f"/meal-plan/generate?plan_id={ctx.plan(i)}",
+         mutates=True),
+]
+
+# Reads first, so writes don't shift what later read cases measure
+CASES = [case for case in ROUTE_CASES + MODEL_CASES if not case.mutates] + \
+    [case for case in ROUTE_CASES + MODEL_CASES if case.mutates]
@@ -0,0 +1,212 @@
+import random
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from models import units
+
+# Ingredients real recipes share, with the unit and category they are stocked in
+BASE_INGREDIENTS = [
+    ("salt", "tsp", "spice"), ("black pepper", "tsp", "spice"), ("olive oil", "tbsp", "oil"),
+    ("garlic", "cloves", "vegetable"), ("onion", "whole", "vegetable"), ("butter", "g", "dairy"),
+    ("egg", "whole", "dairy"), ("flour", "g", "baking"), ("sugar", "g", "baking"), ("milk", "ml", "dairy"),
+    ("tomato", "whole", "vegetable"), ("chicken breast", "g", "meat"), ("rice", "cups", "grain"),
+    ("lemon juice", "tbsp", "condiment"), ("parmesan cheese", "g", "dairy"), ("carrot", "whole", "vegetable"),
+    ("potato", "g", "vegetable"), ("bell pepper", "whole", "vegetable"), ("soy sauce", "tbsp", "condiment"),
+    ("ginger", "g", "vegetable"), ("cumin", "tsp", "spice"), ("paprika", "tsp", "spice"),
+    ("chili powder", "tsp", "spice"), ("spinach", "g", "vegetable"), ("mushroom", "g", "vegetable"),
+    ("beef mince", "g", "meat"), ("pasta", "g", "pasta"), ("spaghetti", "g", "pasta"),
+    ("cream", "ml", "dairy"), ("honey", "tbsp", "sweetener"), ("mustard", "tsp", "condiment"),
+    ("basil", "g", "herb"), ("parsley", "g", "herb"), ("cilantro", "g", "herb"), ("thyme", "tsp", "herb"),
+    ("broccoli", "g", "vegetable"), ("zucchini", "whole", "vegetable"), ("cucumber", "whole", "vegetable"),
+    ("avocado", "whole", "fruit"), ("lime", "whole", "fruit"), ("black beans", "g", "canned goods"),
+    ("chickpeas", "g", "canned goods"), ("coconut milk", "ml", "canned goods"), ("tofu", "g", "protein"),
+    ("salmon", "g", "seafood"), ("shrimp", "g", "seafood"), ("bread", "slices", "bakery"),
+    ("cheddar cheese", "g", "dairy"), ("yogurt", "g", "dairy"), ("oats", "g", "grain"),
+]
+
+# Qualifiers that turn base ingredients into a long tail of rarer ones
+QUALIFIERS = ["fresh", "dried", "smoked", "ground", "roasted", "frozen", "pickled", "toasted", "wild", "baby"]
+
+DISHES = ["stew", "salad", "curry", "bake", "stir fry", "soup", "pasta", "tacos", "bowl", "skillet", "pie", "wrap"]
+MEAL_TAGS = ["breakfast", "lunch", "dinner", "snack"]
+CUISINE_TAGS = ["italian", "mexican", "indian", "thai", "american", "mediterranean", "japanese"]
+
+def ingredient_vocabulary(size):
+    """
+    ``size`` distinct (name, unit, category) ingredients
+
+    The common base ingredients come first, then qualified variants
+    ("smoked paprika"), so rank in the list doubles as popularity rank.
+    """
+    vocabulary = list(BASE_INGREDIENTS)
+    for qualifier in QUALIFIERS:
+        for name, unit, category in BASE_INGREDIENTS:
+            if len(vocabulary) >= size:
+                return vocabulary[:size]
+            vocabulary.append((f"{qualifier} {name}", unit, category))
+    return vocabulary[:size]
+
+class Dataset:
+    """Users, inventory rows, recipes, meal plans and history generated from one seed"""
+
+    def __init__(self, users, inventory, recipes, meal_plans, completed):
+        self.users = users
+        self.inventory = inventory
+        self.recipes = recipes
+        self.meal_plans = meal_plans
+        self.completed = completed
+
+def _pick_ingredients(rng, vocabulary, weights, count):
+    # Zipf-like popularity: a few staples appear in most recipes and pantries
+    chosen = {}
+    while len(chosen) < count:
+        for ingredient in rng.choices(vocabulary, weights=weights, k=count - len(chosen)):
+            chosen.setdefault(ingredient[0], ingredient)
+    return list(chosen.values())
+
+def generate(users=50, items_per_user=30, recipes=5000, vocabulary_size=300, seed=42, today=None):
+    """
+    Build a deterministic dataset
+
+    The same arguments always give the same rows, so query counts and
+    latencies can be compared across runs. Expiry dates are offsets from
+    ``today``.
+
+    Args:
+        users (int): Number of users
+        items_per_user (int): Inventory rows per user
+        recipes (int): Number of recipes
+        vocabulary_size (int): Distinct ingredient names
+        seed (int): Random seed
+        today (date, optional): Reference date, defaults to today
+
+    Returns:
+        Dataset: The generated rows
+    """
+    rng = random.Random(seed)
+    today = today or datetime.now().date()
+    vocabulary = ingredient_vocabulary(vocabulary_size)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(vocabulary))]
+
+    recipe_docs = []
+    for number in range(recipes):
+        ingredients = _pick_ingredients(rng, vocabulary, weights, rng.randint(4, 12))
+        vegetarian = rng.random() < 0.35
+        recipe_docs.append({
+            "name": f"{ingredients[0][0].title()} {rng.choice(DISHES)} #{number}",
+            "description": f"A {rng.choice(CUISINE_TAGS)} dish built around {ingredients[0][0]}.",
+            "ingredients": [
+                {"name": name, "amount": rng.choice([0.5, 1, 2, 3, 100, 200, 250, 400]), "unit": unit}
+                for name, unit, _ in ingredients
+            ],
+            "instructions": [f"Step {step + 1}." for step in range(rng.randint(3, 8))],
+            "prep_time": rng.randint(5, 40),
+            "cook_time": rng.randint(0, 90),
+            "servings": rng.randint(1, 6),
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "tags": rng.sample(MEAL_TAGS, rng.randint(1, 2)) + [rng.choice(CUISINE_TAGS)],
+            "dietary_info": {
+                "vegetarian": vegetarian,
+                "vegan": vegetarian and rng.random() < 0.4,
+                "gluten_free": rng.random() < 0.3,
+                "dairy_free": rng.random() < 0.3
+            },
+            "nutrition": {
+                "calories": rng.randint(150, 900),
+                "protein": rng.randint(2, 60),
+                "carbs": rng.randint(5, 120),
+                "fat": rng.randint(1, 50)
+            },
+            "image_url": ""
+        })
+
+    # One hash for every user; bcrypt is slow by design
+    password = bcrypt.hashpw(b"benchmark", bcrypt.gensalt(rounds=4)).decode('utf-8')
+    user_rows = [(f"bench{number}", f"bench{number}@example.com", password) for number in range(users)]
+
+    inventory_rows = []
+    for user_number in range(users):
+        for name, unit, category in _pick_ingredients(rng, vocabulary, weights, items_per_user):
+            quantity = float(rng.choice([1, 2, 3, 5, 250, 500, 1000]))
+            expiry_date = today + timedelta(days=rng.randint(-2, 30)) if rng.random() < 0.7 else None
+            base_quantity, base_unit = units.normalize(quantity, unit, name)
+            inventory_rows.append((user_number, name, category, quantity, unit, expiry_date, base_quantity, base_unit))
+
+    # Every user has this week's plan, half filled, and some history
+    week_start = today - timedelta(days=today.weekday())
+    meal_plans = []
+    completed = []
+    for user_number in range(users):
+        slots = rng.sample([(day, meal) for day in range(7) for meal in ("breakfast", "lunch", "dinner")], 10)
+        meal_plans.append((user_number, week_start, [(rng.randrange(recipes), day, meal) for day, meal in slots]))
+        completed.extend((user_number, rng.randrange(recipes), rng.randint(1, 4)) for _ in range(rng.randint(0, 12)))
+
+    return Dataset(user_rows, inventory_rows, recipe_docs, meal_plans, completed)
+
+def load(dataset):
+    """
+    Replace the contents of the benchmark databases with ``dataset``
+
+    Only runs against databases whose names end in ``_bench``, since every
+    table and the recipe collection are emptied first.
+
+    Returns:
+        dict: ``user_ids``, ``recipe_ids`` and ``plan_ids`` lists, in dataset order
+    """
+    from flask import current_app
+    from database.ingest import normalize_recipe
+    from database.migrations import run_migrations
+    from database.mongo_setup import get_db
+    from database.mysql_setup import create_database, create_tables, get_connection
+    from models.meal_plan import MealPlan
+
+    db = get_db()
+    if not current_app.config['MYSQL_DB'].endswith('_bench') or not db.name.endswith('_bench'):
+        raise RuntimeError("Benchmarks only load into databases whose names end in '_bench'")
+
+    create_database(current_app.config)
+    create_tables()
+    run_migrations()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ("meal_plan_grocery", "meal_plan_items", "meal_plans", "completed_recipes",
+                  "inventory_versions", "inventory", "user_preferences", "users"):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    db.recipes.delete_many({})
+    documents = [normalize_recipe(recipe) for recipe in dataset.recipes]
+    recipe_ids = []
+    for start in range(0, len(documents), 1000):
+        result = db.recipes.insert_many(documents[start:start + 1000])
+        recipe_ids.extend(str(recipe_id) for recipe_id in result.inserted_ids)
+
+    # Auto-increment restarts at 1 after TRUNCATE, so ids follow dataset order
+    cursor.executemany("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)", dataset.users)
+    user_ids = list(range(1, len(dataset.users) + 1))
+    cursor.executemany("INSERT INTO user_preferences (user_id) VALUES (%s)", [(user_id,) for user_id in user_ids])
+    cursor.executemany(
+        """
+        INSERT INTO inventory
+        (user_id, ingredient_name, category, quantity, unit, expiry_date, base_quantity, base_unit)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        [(user_ids[user], *rest) for user, *rest in dataset.inventory]
+    )
+    cursor.executemany(
+        "INSERT INTO completed_recipes (user_id, recipe_id, servings_made) VALUES (%s, %s, %s)",
+        [(user_ids[user], recipe_ids[recipe], servings) for user, recipe, servings in dataset.completed]
+    )
+    conn.commit()
+    cursor.close()
+
+    plan_ids = []
+    for user, week_start, items in dataset.meal_plans:
+        plan = MealPlan.create(user_ids[user], week_start)
+        MealPlan.replace_items(plan.id, [(recipe_ids[recipe], day, meal) for recipe, day, meal in items])
+        plan_ids.append(plan.id)
+
+    return {"user_ids": user_ids, "recipe_ids": recipe_ids, "plan_ids": plan_ids}
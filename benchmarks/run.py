@@ -0,0 +1,194 @@
+"""
+Benchmark every model hot path and page against a synthetic dataset
+
+Loads a deterministic dataset into local ``*_bench`` databases, times each
+case and counts the MySQL statements and Mongo commands it sends, then
+compares the results with a stored baseline. Exits 1 on a regression and 2
+when there is no baseline recorded with the same dataset parameters.
+
+    python -m benchmarks.run                      # load, run, compare
+    python -m benchmarks.run --update-baseline    # record a new baseline
+    python -m benchmarks.run --no-load -k Recipe  # reuse loaded data, filter cases
+
+Needs a running mongod and mysqld; point at them with BENCH_MONGO_URI and the
+usual MYSQL_* variables. BENCH_MYSQL_DB defaults to ``cookbookit_bench``.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Configure before the app (and Config) are imported
+os.environ['MYSQL_DB'] = os.environ.get('BENCH_MYSQL_DB', 'cookbookit_bench')
+os.environ['MONGO_URI'] = os.environ.get('BENCH_MONGO_URI', 'mongodb://localhost:27017/cookbookit_bench')
+os.environ['QUERY_INSTRUMENTATION'] = 'true'
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def clear_caches():
+    from models.inventory import expiry_queues, inventory_cache
+    from models.recipe import recipe_cache, recipe_query_cache
+
+    recipe_cache.clear()
+    recipe_query_cache.clear()
+    inventory_cache.clear()
+    expiry_queues.clear()
+
+def measure(app, client, case, ctx, repeat, warmup, cold):
+    from database.instrumentation import QueryLog
+
+    latencies = []
+    mysql_queries = 0
+    mongo_queries = 0
+    for i in range(warmup + repeat):
+        if cold:
+            clear_caches()
+
+        if case.kind == 'route':
+            url = case.call(ctx, i)
+            with client.session_transaction() as session:
+                session['_user_id'] = str(ctx.user(i))
+                session['_fresh'] = True
+            with QueryLog() as log:
+                started = time.perf_counter()
+                response = client.get(url)
+                response.get_data()  # Streamed pages render while the body is read
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f"{case.name}: {url} returned {response.status_code}")
+        else:
+            with app.app_context(), QueryLog() as log:
+                started = time.perf_counter()
+                case.call(ctx, i)
+                elapsed = time.perf_counter() - started
+
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            mysql_queries += log.count('mysql')
+            mongo_queries += log.count('mongo')
+
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "mysql_queries": round(mysql_queries / repeat, 2),
+        "mongo_queries": round(mongo_queries / repeat, 2),
+    }
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    List regressions against the baseline
+
+    A case regresses when its p95 grows by more than ``tolerance`` (and by
+    at least ``min_delta_ms``, to ignore noise on sub-millisecond calls), or
+    when it sends more queries per call than before. A case the baseline
+    doesn't know also fails, so new cases get recorded.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            regressions.append(f"{name}: not in the baseline; record it with --update-baseline")
+            continue
+        limit = max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + min_delta_ms)
+        if result["p95_ms"] > limit:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f} ms, baseline {before['p95_ms']:.2f} ms")
+        for kind in ("mysql_queries", "mongo_queries"):
+            if result[kind] > before[kind] + 0.01:
+                regressions.append(f"{name}: {result[kind]} {kind} per call, baseline {before[kind]}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CookBookIt models and routes.")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--items', type=int, default=30, help="Inventory rows per user")
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=50, help="Measured calls per case")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured calls per case first")
+    parser.add_argument('--cold', action='store_true', help="Clear in-process caches before every call")
+    parser.add_argument('-k', dest='pattern', default=None, help="Only run cases whose name contains this")
+    parser.add_argument('--no-load', action='store_true', help="Reuse the data already loaded")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 growth, as a fraction")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="Ignore p95 growth smaller than this")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from benchmarks.cases import CASES, Context
+    from benchmarks.data import generate, load
+
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    params = {"users": args.users, "items": args.items, "recipes": args.recipes, "seed": args.seed,
+              "cold": args.cold}
+    dataset = generate(users=args.users, items_per_user=args.items, recipes=args.recipes, seed=args.seed)
+    with app.app_context():
+        if args.no_load:
+            from database.mongo_setup import get_db
+            loaded = {
+                "user_ids": list(range(1, args.users + 1)),
+                "recipe_ids": [str(doc["_id"]) for doc in get_db().recipes.find({}, {"_id": 1}).sort("_id", 1)],
+                "plan_ids": list(range(1, args.users + 1)),
+            }
+        else:
+            started = time.perf_counter()
+            loaded = load(dataset)
+            print(f"Loaded dataset in {time.perf_counter() - started:.1f}s")
+    ctx = Context(dataset, loaded)
+
+    client = app.test_client()
+    results = {}
+    print(f"{'case':<42} {'p50':>8} {'p95':>8} {'p99':>8} {'mysql':>6} {'mongo':>6}")
+    for case in CASES:
+        if args.pattern and args.pattern not in case.name:
+            continue
+        result = measure(app, client, case, ctx, args.repeat, args.warmup, args.cold)
+        results[case.name] = result
+        print(f"{case.name:<42} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['mysql_queries']:>6} {result['mongo_queries']:>6}")
+
+    if args.update_baseline:
+        # A filtered run only replaces the cases it ran
+        if args.pattern and os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous.get("params") == params:
+                results = {**previous["results"], **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"params": params, "results": results}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    # Nothing to compare against is a failure, not a pass
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 2
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("params") != params:
+        print(f"Baseline was recorded with {baseline.get('params')}, not {params}; can't compare.")
+        return 2
+
+    regressions = compare(results, baseline["results"], args.tolerance, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,6 +15,57 @@ class Config:
     MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', 'root@123')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'cookbookit')
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 10))
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT', 5))  # Seconds to wait for a free connection
+    MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE', 1800))  # Seconds before a connection is replaced
+    MYSQL_POOL_HEALTH_CHECK_AFTER = int(os.environ.get('MYSQL_POOL_HEALTH_CHECK_AFTER', 30))  # Idle seconds before a ping
+    
+    # Threads running a page's independent reads concurrently (0 runs them one after another).
+    # One pool of these per process, shared by all requests; each busy thread holds a pooled
+    # connection, so MYSQL_POOL_SIZE needs GUNICORN_THREADS + PAGE_LOADER_WORKERS.
+    PAGE_LOADER_WORKERS = int(os.environ.get('PAGE_LOADER_WORKERS', 4))
+    
+    # Recipe cache settings
+    RECIPE_CACHE_SIZE = int(os.environ.get('RECIPE_CACHE_SIZE', 5000))  # Recipe documents kept in memory
+    RECIPE_QUERY_CACHE_SIZE = int(os.environ.get('RECIPE_QUERY_CACHE_SIZE', 500))  # Cached listing/search results
+    RECIPE_CACHE_TTL = int(os.environ.get('RECIPE_CACHE_TTL', 300))  # Seconds
+    RECIPE_CACHE_WATCH = os.environ.get('RECIPE_CACHE_WATCH', 'false').lower() == 'true'  # Needs a replica set
+    
+    # Ingredient match ranking: 'index' (in-memory inverted index) or 'aggregate' (Mongo pipeline)
+    RECIPE_MATCH_ENGINE = os.environ.get('RECIPE_MATCH_ENGINE', 'index')
+    
+    # Per-user inventory cache, keyed by versions kept in MySQL: 'memory' (entries per process) or 'redis' (entries shared, needs the redis package)
+    INVENTORY_CACHE_BACKEND = os.environ.get('INVENTORY_CACHE_BACKEND', 'memory')
+    INVENTORY_CACHE_URL = os.environ.get('INVENTORY_CACHE_URL', 'redis://localhost:6379/0')
+    INVENTORY_CACHE_SIZE = int(os.environ.get('INVENTORY_CACHE_SIZE', 5000))  # Snapshots and memoized results kept in memory
+    INVENTORY_CACHE_TTL = int(os.environ.get('INVENTORY_CACHE_TTL', 300))  # Seconds
+    
+    # Per-user expiry queues behind "use it up" ranking
+    EXPIRY_CACHE_SIZE = int(os.environ.get('EXPIRY_CACHE_SIZE', 1000))  # Users whose queue is kept in memory
+    EXPIRY_CACHE_TTL = int(os.environ.get('EXPIRY_CACHE_TTL', 600))  # Seconds before a queue is reloaded
+    EXPIRY_RANKING_DAYS = int(os.environ.get('EXPIRY_RANKING_DAYS', 7))  # How far ahead expiring stock boosts recipes
+    
+    # Meal plan generator settings
+    MEAL_PLAN_CANDIDATES = int(os.environ.get('MEAL_PLAN_CANDIDATES', 200))  # Best-matching recipes the planner chooses from
+    MEAL_PLAN_DEADLINE_MS = float(os.environ.get('MEAL_PLAN_DEADLINE_MS', 80))  # From request start to a chosen plan; the search gets what is left
+    
+    # Recipe catalog ingestion (flask --app app ingest-recipes)
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 1000))  # Documents per unordered bulk_write
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 4))  # Batches written concurrently
+    
+    # Record every MySQL statement and Mongo command so benchmarks and profiling can count them
+    QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'false').lower() == 'true'
+    
+    # Per-request query profiling: Server-Timing header plus a warning log for slow or chatty requests
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', 'false').lower() == 'true'  # Turns on QUERY_INSTRUMENTATION
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 500))  # Log requests slower than this
+    SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', 30))  # Log requests running more queries
+    REPEATED_QUERY_THRESHOLD = int(os.environ.get('REPEATED_QUERY_THRESHOLD', 5))  # Identical statements flagged as N+1
+    
+    # Startup settings
+    BOOT_TIME_BUDGET_MS = float(os.environ.get('BOOT_TIME_BUDGET_MS', 1000))  # Import plus create_app(), per process
     
     # Application settings
-    EXPIRATION_WARNING_DAYS = 3  # Days before expiration to start showing warnings
\ No newline at end of file
+    EXPIRATION_WARNING_DAYS = 3  # Days before expiration to start showing warnings
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # Seconds a session-cached user is trusted
+    RECIPE_PAGE_SIZE = int(os.environ.get('RECIPE_PAGE_SIZE', 24))  # Recipes per listing/search page
\ No newline at end of file
@@ -0,0 +1,172 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo.errors import PyMongoError
+
+try:
+    import redis
+except ImportError:  # Only needed for the redis cache backend
+    redis = None
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with a per-entry time to live
+
+    Keeps hit/miss/eviction counters so cache effectiveness can be checked
+    at runtime through ``stats()``.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if self.ttl and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+class RedisCache:
+    """
+    ``LRUCache``-compatible cache stored in Redis (or any Redis-compatible server)
+
+    Lets several worker processes share one cache. Values are pickled;
+    eviction is left to the server's ``maxmemory-policy``.
+    """
+
+    def __init__(self, url=None, ttl=300, prefix='cookbookit', client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The redis cache backend needs the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def get(self, key, default=None):
+        data = self.client.get(self._key(key))
+        if data is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(data)
+
+    def set(self, key, value):
+        self.client.set(self._key(key), pickle.dumps(value), ex=self.ttl or None)
+
+    def pop(self, key):
+        value = self.get(key)
+        self.client.delete(self._key(key))
+        return value
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0
+        }
+
+def make_cache(backend='memory', max_size=1000, ttl=300, url=None, prefix='cookbookit'):
+    """
+    Build a cache for the configured backend
+
+    Args:
+        backend (str): ``memory`` for an in-process ``LRUCache``, ``redis`` for
+            a ``RedisCache`` shared between processes
+        max_size (int): Entries kept by the in-process backend
+        ttl (int): Seconds an entry lives
+        url (str, optional): Server URL for the redis backend
+        prefix (str): Key prefix for the redis backend
+
+    Returns:
+        LRUCache or RedisCache
+    """
+    if backend == 'redis':
+        return RedisCache(url=url, ttl=ttl, prefix=prefix)
+    return LRUCache(max_size=max_size, ttl=ttl)
+
+def watch_collection(collection, on_change, on_error=None):
+    """
+    Call ``on_change(change)`` for every change on a Mongo collection
+
+    Runs a change stream on a daemon thread. Change streams need a replica
+    set (a single-node ``mongod --replSet`` is enough for local testing);
+    on a standalone server the stream fails and ``on_error`` is called.
+
+    Returns:
+        threading.Thread: The started listener thread
+    """
+    def listen():
+        try:
+            with collection.watch(full_document='updateLookup') as stream:
+                for change in stream:
+                    on_change(change)
+        except PyMongoError as e:
+            if on_error:
+                on_error(e)
+            else:
+                print(f"Change stream on {collection.name} stopped: {e}")
+
+    thread = threading.Thread(target=listen, name=f"watch-{collection.name}", daemon=True)
+    thread.start()
+    return thread
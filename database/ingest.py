@@ -0,0 +1,351 @@
+import csv
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from config import Config
+from database.mongo_setup import get_db
+from models import units
+from models.ingredient_index import DIETARY_KEYS
+
+# Mongo's duplicate key error code, raised by the unique content_hash index
+DUPLICATE_KEY = 11000
+
+class InvalidRecipe(ValueError):
+    """Raised when an input record can't be turned into a recipe document"""
+
+def ensure_content_hash_index(db):
+    """
+    Create the partial unique index on ``content_hash`` if it is missing
+
+    Documents without a hash (written before hashing existed) are left out
+    of the index. Creating an index that already exists is a no-op.
+    """
+    db.recipes.create_index(
+        "content_hash",
+        name="content_hash",
+        unique=True,
+        partialFilterExpression={"content_hash": {"$exists": True}}
+    )
+
+class IngestStats:
+    """Running counters for one ingestion run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.skipped = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.read} read, {self.inserted} inserted, {self.duplicates} duplicates, "
+                f"{self.invalid} invalid in {self.elapsed:.1f}s ({self.rate:.0f} recipes/s)")
+
+def read_records(path):
+    """
+    Stream raw records from a JSONL or CSV file without loading it whole
+
+    CSV columns holding lists or objects (``ingredients``, ``dietary_info``,
+    ``nutrition``) are JSON-encoded; ``tags`` and ``instructions`` may
+    instead be ``|``-separated.
+
+    Yields:
+        tuple: 1-based record position and the raw record, or the
+        ``InvalidRecipe`` a malformed line raised in place of the record
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for position, row in enumerate(csv.DictReader(f), start=1):
+                try:
+                    yield position, _parse_csv_row(row)
+                except ValueError as e:
+                    yield position, InvalidRecipe(f"bad CSV field: {e}")
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for position, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield position, json.loads(line)
+            except ValueError as e:
+                yield position, InvalidRecipe(f"bad JSON: {e}")
+
+def _parse_csv_row(row):
+    record = {key: value for key, value in row.items() if key and value not in (None, '')}
+    for key in ('ingredients', 'instructions', 'tags', 'dietary_info', 'nutrition'):
+        value = record.get(key)
+        if value is None:
+            continue
+        if value.lstrip()[:1] in ('[', '{'):
+            record[key] = json.loads(value)
+        elif key in ('instructions', 'tags'):
+            record[key] = [part for part in value.split('|') if part.strip()]
+    return record
+
+def normalize_name(name):
+    """Lowercase an ingredient name and collapse its whitespace"""
+    return " ".join(str(name).split()).lower()
+
+def _number(value, field, minimum=0):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRecipe(f"{field} is not a number: {value!r}")
+    if not math.isfinite(number) or number < minimum:
+        raise InvalidRecipe(f"{field} must be at least {minimum}: {value!r}")
+    return int(number) if number.is_integer() else number
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1')
+    return bool(value)
+
+def _text(record, field):
+    value = record.get(field)
+    return str(value).strip() if value is not None else ""
+
+def normalize_recipe(record):
+    """
+    Validate a raw record and build the recipe document stored in Mongo
+
+    Ingredient names are normalized so the same ingredient always matches
+    inventory rows and the ingredient index, and base amounts are stored
+    next to the raw ones like ``Recipe.insert`` does. Unknown fields are
+    dropped.
+
+    Args:
+        record (dict): Raw record from ``read_records``
+
+    Returns:
+        dict: Recipe document including its ``content_hash``
+
+    Raises:
+        InvalidRecipe: If a required field is missing or malformed
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecipe("record is not an object")
+
+    name = " ".join(_text(record, "name").split())
+    if not name:
+        raise InvalidRecipe("missing name")
+
+    raw_ingredients = record.get("ingredients")
+    if not isinstance(raw_ingredients, list) or not raw_ingredients:
+        raise InvalidRecipe("missing ingredients")
+
+    ingredients = []
+    for raw in raw_ingredients:
+        if not isinstance(raw, dict) or not normalize_name(raw.get("name", "")):
+            raise InvalidRecipe(f"bad ingredient: {raw!r}")
+        ingredients.append({
+            "name": normalize_name(raw["name"]),
+            "amount": _number(raw.get("amount", 0), "ingredient amount"),
+            "unit": str(raw.get("unit") or "").strip().lower()
+        })
+    units.normalize_ingredients(ingredients)
+
+    instructions = record.get("instructions") or []
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    dietary_info = record.get("dietary_info") or {}
+    nutrition = record.get("nutrition") or {}
+    if not isinstance(instructions, list) or not isinstance(dietary_info, dict) or not isinstance(nutrition, dict):
+        raise InvalidRecipe("instructions, dietary_info or nutrition has the wrong type")
+
+    recipe = {
+        "name": name,
+        "description": _text(record, "description"),
+        "ingredients": ingredients,
+        "instructions": [str(step).strip() for step in instructions if str(step).strip()],
+        "prep_time": _number(record.get("prep_time", 0), "prep_time"),
+        "cook_time": _number(record.get("cook_time", 0), "cook_time"),
+        "servings": _number(record.get("servings", 1), "servings", minimum=1),
+        "difficulty": _text(record, "difficulty"),
+        "tags": sorted({normalize_name(tag) for tag in record.get("tags") or [] if normalize_name(tag)}),
+        "dietary_info": {key: _flag(dietary_info.get(key, False)) for key in DIETARY_KEYS},
+        "nutrition": {key: _number(value, f"nutrition.{key}") for key, value in nutrition.items()},
+        "image_url": _text(record, "image_url")
+    }
+    recipe["content_hash"] = content_hash(recipe)
+    return recipe
+
+def content_hash(recipe):
+    """
+    Hash what makes two recipes the same dish
+
+    Name, ingredients (in any order) and instructions count; descriptions,
+    tags and images don't, so re-exported copies of a recipe still match.
+    """
+    key = {
+        "name": recipe["name"].lower(),
+        "ingredients": sorted(
+            (i["name"], float(i.get("amount", 0) or 0), i.get("unit", "")) for i in recipe["ingredients"]
+        ),
+        "instructions": recipe.get("instructions", [])
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _batches(records, batch_size, stats, resume_after, on_invalid):
+    # Dedupe inside the run here; the unique index catches earlier runs
+    seen = set()
+    batch = []
+    position = resume_after
+    for position, record in records:
+        if position <= resume_after:
+            stats.skipped += 1
+            continue
+        stats.read += 1
+        try:
+            if isinstance(record, InvalidRecipe):
+                raise record
+            recipe = normalize_recipe(record)
+        except InvalidRecipe as e:
+            stats.invalid += 1
+            if on_invalid:
+                on_invalid(position, e)
+            continue
+
+        if recipe["content_hash"] in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(recipe["content_hash"])
+
+        batch.append(recipe)
+        if len(batch) >= batch_size:
+            yield position, batch
+            batch = []
+    yield position, batch
+
+def _write_batch(docs):
+    if not docs:
+        return 0, 0
+    try:
+        result = get_db().recipes.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        return result.inserted_count, 0
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+        return e.details.get("nInserted", 0), len(errors)
+
+def _read_checkpoint(checkpoint_path, source):
+    try:
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return checkpoint.get("position", 0) if checkpoint.get("source") == source else 0
+
+def _write_checkpoint(checkpoint_path, source, position):
+    # Write then rename, so a crash never leaves a half-written checkpoint
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"source": source, "position": position}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def ingest_recipes(path, batch_size=None, workers=None, checkpoint_path=None,
+                   report=None, report_every=5.0, on_invalid=None):
+    """
+    Stream a JSONL or CSV recipe catalog into Mongo
+
+    Records are validated and normalized one at a time, deduplicated by
+    content hash, and written as unordered ``bulk_write`` batches by a pool
+    of workers, so memory stays flat however large the file is. Recipes
+    already in the collection are rejected by the unique ``content_hash``
+    index and counted as duplicates, which makes re-running a file safe.
+    The index is created first if it is missing, so this holds even before
+    ``flask migrate`` has run.
+
+    With a checkpoint, the position of the last record whose batch and every
+    earlier batch is stored is saved as batches finish. A rerun after a
+    failure picks up from there, and the checkpoint is removed when a run
+    completes.
+
+    Args:
+        path (str): JSONL or CSV file (by extension)
+        batch_size (int, optional): Documents per ``bulk_write``, defaults to ``INGEST_BATCH_SIZE``
+        workers (int, optional): Concurrent writers, defaults to ``INGEST_WORKERS``
+        checkpoint_path (str, optional): Where to keep the resume position; None disables resuming
+        report (callable, optional): Called with the ``IngestStats`` at most every ``report_every`` seconds
+        report_every (float): Seconds between progress reports
+        on_invalid (callable, optional): Called with the position and error of each rejected record
+
+    Returns:
+        IngestStats: Final counters
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    workers = max(workers or Config.INGEST_WORKERS, 1)
+    ensure_content_hash_index(get_db())
+    source = os.path.abspath(path)
+    resume_after = _read_checkpoint(checkpoint_path, source) if checkpoint_path else 0
+
+    stats = IngestStats()
+    batches = _batches(read_records(path), batch_size, stats, resume_after, on_invalid)
+
+    # Batches finish out of order; only checkpoint past a contiguous prefix
+    ends = []
+    finished = set()
+    next_to_checkpoint = 0
+    last_report = time.monotonic()
+
+    def collect(done):
+        nonlocal next_to_checkpoint
+        for future in done:
+            sequence = pending.pop(future)
+            inserted, duplicates = future.result()
+            stats.inserted += inserted
+            stats.duplicates += duplicates
+            finished.add(sequence)
+
+        advanced = False
+        while next_to_checkpoint in finished:
+            finished.discard(next_to_checkpoint)
+            next_to_checkpoint += 1
+            advanced = True
+        if advanced and checkpoint_path:
+            _write_checkpoint(checkpoint_path, source, ends[next_to_checkpoint - 1])
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recipe-ingest') as executor:
+        try:
+            for end, docs in batches:
+                ends.append(end)
+                pending[executor.submit(_write_batch, docs)] = len(ends) - 1
+
+                # Keep a bounded number of batches in flight
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                if report and time.monotonic() - last_report >= report_every:
+                    report(stats)
+                    last_report = time.monotonic()
+
+            collect(wait(pending).done)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if report:
+        report(stats)
+    return stats
@@ -0,0 +1,146 @@
+import contextvars
+import time
+
+from pymongo import monitoring
+
+# The log statements are currently recorded into, if any. A context variable,
+# so each request thread (and the page loader tasks it spawns) has its own.
+_current_log = contextvars.ContextVar('query_log', default=None)
+
+class QueryLog:
+    """
+    MySQL statements and Mongo commands run while the log is active
+
+    Use it as a context manager; everything the current thread (or context)
+    sends to either database in the meantime is recorded with its duration.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._pending = {}
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_log.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_log.reset(self._token)
+        self._token = None
+
+    def record(self, kind, statement, duration_ms):
+        """Record one statement; ``kind`` is ``'mysql'`` or ``'mongo'``"""
+        self.entries.append((kind, statement, duration_ms))
+
+    def count(self, kind=None):
+        return sum(1 for entry in self.entries if kind is None or entry[0] == kind)
+
+    def total_ms(self, kind=None):
+        return sum(entry[2] for entry in self.entries if kind is None or entry[0] == kind)
+
+def active_log():
+    """Return the ``QueryLog`` statements are being recorded into, or None"""
+    return _current_log.get()
+
+def _record(kind, statement, started):
+    log = _current_log.get()
+    if log is not None:
+        log.record(kind, statement, (time.perf_counter() - started) * 1000)
+
+class InstrumentedCursor:
+    """MySQL cursor proxy that records each statement it executes"""
+
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            _record('mysql', operation, started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _record('mysql', operation, started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """MySQL connection proxy whose cursors, commits and rollbacks are recorded"""
+
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            _record('mysql', 'COMMIT', started)
+
+    def rollback(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.rollback()
+        finally:
+            _record('mysql', 'ROLLBACK', started)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def _describe(event):
+    # "find recipes {'ingredients.name': ...}": command, collection and the query part
+    command = event.command
+    target = command.get(event.command_name)
+    for key in ('filter', 'pipeline', 'query', 'q', 'updates', 'deletes'):
+        if key in command:
+            return f"{event.command_name} {target} {command[key]!r}"[:500]
+    return f"{event.command_name} {target}"
+
+class MongoCommandRecorder(monitoring.CommandListener):
+    """
+    pymongo command listener feeding the active ``QueryLog``
+
+    pymongo calls listeners on the thread that runs the command, so commands
+    land in the log of whoever issued them.
+    """
+
+    def started(self, event):
+        log = _current_log.get()
+        if log is not None:
+            log._pending[event.request_id] = _describe(event)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        log = _current_log.get()
+        if log is None:
+            return
+        statement = log._pending.pop(event.request_id, None)
+        if statement is not None:
+            log.record('mongo', statement, event.duration_micros / 1000)
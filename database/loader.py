@@ -0,0 +1,63 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(config):
+    # Created on first use, so forked workers each start their own threads.
+    # One executor serves every request in the process, so loader threads add
+    # at most PAGE_LOADER_WORKERS connections however many pages are loading.
+    # It never gets the whole pool, leaving a connection for the request
+    # thread that waits on it.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, min(config['PAGE_LOADER_WORKERS'], config['MYSQL_POOL_SIZE'] - 1)),
+                    thread_name_prefix='page-loader'
+                )
+    return _executor
+
+def load_concurrently(**tasks):
+    """
+    Run a page's independent reads at the same time
+
+    Every task but the last runs on the process's shared, bounded thread pool
+    inside its own app context, so it checks out its own pooled MySQL
+    connection and returns it when done. A process therefore holds at most
+    one connection per request thread plus ``PAGE_LOADER_WORKERS``. The last
+    task runs in the calling thread on the request's connection. Page latency
+    then tracks the slowest task rather than the sum of them all.
+
+    Tasks on the pool have no request context: pass ``current_user.id`` and
+    any request arguments in explicitly instead of reading ``current_user``
+    or ``request`` inside a task.
+
+    Args:
+        **tasks: Name -> zero-argument callable
+
+    Returns:
+        dict: Name -> result. An exception raised by a task is re-raised here.
+    """
+    app = current_app._get_current_object()
+    if app.config['PAGE_LOADER_WORKERS'] <= 0 or len(tasks) <= 1:
+        return {name: task() for name, task in tasks.items()}
+
+    def run(task):
+        with app.app_context():
+            return task()
+
+    *pooled, (inline_name, inline_task) = tasks.items()
+    executor = _get_executor(app.config)
+    # Each task runs in a copy of the caller's context, so query logging follows it
+    futures = {name: executor.submit(contextvars.copy_context().run, run, task) for name, task in pooled}
+
+    results = {inline_name: inline_task()}
+    for name, future in futures.items():
+        results[name] = future.result()
+    return results
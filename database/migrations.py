@@ -0,0 +1,309 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from database.mysql_setup import get_connection
+from database.mongo_setup import get_db
+from models import units
+
+class QueryPlanError(Exception):
+    """Raised when a hot query can't use an index"""
+
+def _backfill_inventory_base_quantities(cursor):
+    cursor.execute("SELECT id, ingredient_name, quantity, unit FROM inventory")
+    rows = [
+        (*units.normalize(quantity, unit, ingredient_name), item_id)
+        for item_id, ingredient_name, quantity, unit in cursor.fetchall()
+    ]
+    if rows:
+        cursor.executemany("UPDATE inventory SET base_quantity = %s, base_unit = %s WHERE id = %s", rows)
+
+def _backfill_meal_plan_grocery(cursor):
+    # Imported here; the model pulls in the recipe cache and Mongo setup
+    from models.meal_plan import MealPlan
+
+    cursor.execute("SELECT DISTINCT meal_plan_id FROM meal_plan_items")
+    for (plan_id,) in cursor.fetchall():
+        MealPlan.rebuild_grocery(cursor, plan_id)
+
+def _create_index(table, name, columns):
+    def create(cursor):
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+            """,
+            (table, name)
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    return create
+
+def _add_column(table, name, definition):
+    def add(cursor):
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+            """,
+            (table, name)
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return add
+
+# Versioned MySQL migrations: (version, description, statements). A statement
+# may also be a function taking the cursor, for checked DDL and data backfills.
+#
+# MySQL commits every DDL statement on its own, so a migration that fails
+# halfway can't roll back what it already changed and is run again from the
+# start. Every step must therefore be safe to repeat: DDL checks
+# information_schema or uses IF NOT EXISTS, and backfills recompute their rows.
+MYSQL_MIGRATIONS = [
+    (1, "Secondary indexes for hot queries", [
+        _create_index('inventory', 'idx_inventory_user_ingredient', 'user_id, ingredient_name'),
+        _create_index('inventory', 'idx_inventory_user_expiry', 'user_id, expiry_date'),
+        _create_index('meal_plans', 'idx_meal_plans_user_week', 'user_id, week_start_date'),
+        _create_index('meal_plan_items', 'idx_meal_plan_items_plan', 'meal_plan_id, day_of_week'),
+        _create_index('completed_recipes', 'idx_completed_user_date', 'user_id, completed_date, id')
+    ]),
+    (2, "Normalized base quantities for inventory", [
+        _add_column('inventory', 'base_quantity', 'FLOAT NULL'),
+        _add_column('inventory', 'base_unit', 'VARCHAR(20) NULL'),
+        _backfill_inventory_base_quantities
+    ]),
+    (3, "Materialized grocery totals per meal plan", [
+        """
+        CREATE TABLE IF NOT EXISTS meal_plan_grocery (
+            meal_plan_id INT NOT NULL,
+            ingredient_name VARCHAR(100) NOT NULL,
+            base_unit VARCHAR(20) NOT NULL,
+            unit VARCHAR(20) NOT NULL,
+            amount DOUBLE NOT NULL,
+            PRIMARY KEY (meal_plan_id, ingredient_name, base_unit),
+            FOREIGN KEY (meal_plan_id) REFERENCES meal_plans(id) ON DELETE CASCADE
+        )
+        """,
+        _backfill_meal_plan_grocery
+    ]),
+    (4, "Shared inventory versions for cross-process caches", [
+        """
+        CREATE TABLE IF NOT EXISTS inventory_versions (
+            user_id INT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    ]),
+]
+
+def _create_recipe_indexes(db):
+    # Default index name, so existing deployments that built it inline keep it
+    db.recipes.create_index([("name", "text"), ("description", "text")])
+    db.recipes.create_index(
+        [
+            ("dietary_info.vegetarian", 1),
+            ("dietary_info.vegan", 1),
+            ("dietary_info.gluten_free", 1),
+            ("dietary_info.dairy_free", 1)
+        ],
+        name="dietary_info"
+    )
+    db.recipes.create_index("ingredients.name")
+
+def _backfill_recipe_base_amounts(db):
+    requests = [
+        UpdateOne(
+            {"_id": recipe["_id"]},
+            {"$set": {"ingredients": units.normalize_ingredients(recipe.get("ingredients", []))}}
+        )
+        for recipe in db.recipes.find({}, {"ingredients": 1})
+    ]
+    if requests:
+        db.recipes.bulk_write(requests, ordered=False)
+
+def _backfill_recipe_content_hashes(db):
+    # Imported here so the ingestion pipeline isn't loaded on every migration run
+    from database.ingest import InvalidRecipe, ensure_content_hash_index, normalize_recipe
+
+    # The first copy of a recipe keeps the hash; later copies stay unhashed
+    seen = set()
+    requests = []
+    for recipe in db.recipes.find({}, {"name": 1, "ingredients": 1, "instructions": 1}).sort("_id", 1):
+        try:
+            key = normalize_recipe(recipe)["content_hash"]
+        except InvalidRecipe:
+            continue
+        if key not in seen:
+            seen.add(key)
+            requests.append(UpdateOne({"_id": recipe["_id"]}, {"$set": {"content_hash": key}}))
+    if requests:
+        db.recipes.bulk_write(requests, ordered=False)
+
+    ensure_content_hash_index(db)
+
+# Versioned Mongo migrations: (version, description, function taking the database)
+MONGO_MIGRATIONS = [
+    (1, "Recipe text, dietary and ingredient indexes", _create_recipe_indexes),
+    (2, "Normalized base amounts for recipe ingredients", _backfill_recipe_base_amounts),
+    (3, "Unique content hashes for recipe deduplication", _backfill_recipe_content_hashes),
+]
+
+def hot_mysql_queries():
+    """
+    Statements on the request path that must never scan a whole table
+
+    Built from the SQL constants the models execute, so a changed query is
+    checked as it now runs. ``IN`` lists are expanded to one placeholder.
+
+    Returns:
+        list: ``(sql, params)`` pairs with placeholder values to EXPLAIN
+    """
+    # Imported here, like the backfills, so loading migrations doesn't load every model
+    from models.completed_recipe import CompletedRecipe
+    from models.inventory import Inventory
+    from models.meal_plan import MealPlan
+    from models.user import User
+    from models.user_preferences import UserPreferences
+
+    today = datetime.now().date()
+    return [
+        (Inventory.select(Inventory.BY_USER_CLAUSE), (0,)),
+        (Inventory.QUANTITY_SQL, (0, "")),
+        (Inventory.select(Inventory.EXPIRING_CLAUSE), (0, today)),
+        (Inventory.EXPIRY_QUEUE_SQL, (0,)),
+        (Inventory.VERSION_SQL, (0,)),
+        (Inventory.LOCK_ROWS_SQL.format(placeholders="%s"), (0, "")),
+        (MealPlan.select(MealPlan.WEEK_CLAUSE), (0, today)),
+        (MealPlan.select(MealPlan.RANGE_CLAUSE), (0, today, today)),
+        (MealPlan.ITEMS_SQL.format(placeholders="%s"), (0,)),
+        (MealPlan.GROCERY_SQL.format(placeholders="%s"), (0, 0)),
+        (CompletedRecipe.select(CompletedRecipe.PAGE_CLAUSE), (0, 10)),
+        (CompletedRecipe.select(CompletedRecipe.PAGE_AFTER_CLAUSE), (0, today, today, 0, 10)),
+        (UserPreferences.BY_USER_SQL, (0,)),
+        (User.BY_EMAIL_SQL, ("",)),
+    ]
+
+HOT_MONGO_QUERIES = [
+    {"ingredients.name": {"$in": ["salt"]}},
+    {"$text": {"$search": "pasta"}},
+    {
+        "dietary_info.vegetarian": True,
+        "dietary_info.vegan": {"$in": [True, False, None]},
+        "dietary_info.gluten_free": {"$in": [True, False, None]},
+        "dietary_info.dairy_free": {"$in": [True, False, None]}
+    },
+]
+
+def run_migrations():
+    """
+    Apply every pending MySQL and Mongo migration
+
+    Applied versions are recorded in the ``schema_migrations`` table and
+    collection, so running it again only applies what is new.
+
+    Returns:
+        list: Descriptions of the migrations that were applied
+    """
+    return _run_mysql_migrations() + _run_mongo_migrations()
+
+def _run_mysql_migrations():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    applied_versions = {row[0] for row in cursor.fetchall()}
+
+    applied = []
+    for version, description, statements in MYSQL_MIGRATIONS:
+        if version in applied_versions:
+            continue
+
+        for statement in statements:
+            if callable(statement):
+                statement(cursor)
+            else:
+                cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        conn.commit()
+        applied.append(f"mysql {version}: {description}")
+
+    cursor.close()
+    return applied
+
+def _run_mongo_migrations():
+    db = get_db()
+    applied_versions = {doc["_id"] for doc in db.schema_migrations.find({}, {"_id": 1})}
+
+    applied = []
+    for version, description, migrate in MONGO_MIGRATIONS:
+        if version in applied_versions:
+            continue
+
+        migrate(db)
+        db.schema_migrations.insert_one({
+            "_id": version,
+            "description": description,
+            "applied_at": datetime.now()
+        })
+        applied.append(f"mongo {version}: {description}")
+
+    return applied
+
+def verify_query_plans():
+    """
+    EXPLAIN every hot query and fail if one can only run as a full scan
+
+    Raises:
+        QueryPlanError: Listing every query without a usable index
+    """
+    problems = _check_mysql_plans() + _check_mongo_plans()
+    if problems:
+        raise QueryPlanError("Hot queries without a usable index:\n" + "\n".join(problems))
+
+def _check_mysql_plans():
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    problems = []
+    for sql, params in hot_mysql_queries():
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            # Small tables may still pick a scan; only fail when no index could be
+            # used. Derived tables (``<derived2>``) are scanned by design.
+            if row['type'] == 'ALL' and not row['possible_keys'] and not row['table'].startswith('<'):
+                problems.append(f"mysql full scan of {row['table']}: {sql}")
+
+    cursor.close()
+    return problems
+
+def _find_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_find_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_find_stages(child))
+    return stages
+
+def _check_mongo_plans():
+    db = get_db()
+
+    problems = []
+    for query in HOT_MONGO_QUERIES:
+        plan = db.recipes.find(query).explain()["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _find_stages(plan):
+            problems.append(f"mongo collection scan of recipes: {query}")
+
+    return problems
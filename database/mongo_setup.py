@@ -1,237 +1,77 @@
+import os
+import threading
+
 from flask import Flask
 from pymongo import MongoClient
-import json
-import os
+from config import Config
+from database.instrumentation import MongoCommandRecorder
 
-mongo_client = MongoClient("mongodb://localhost:27017/")
-mongo_db = mongo_client["cookbookit"]
+_mongo_uri = Config.MONGO_URI
+_instrumented = Config.QUERY_INSTRUMENTATION
+_mongo_client = None
+_mongo_pid = None
+_mongo_lock = threading.Lock()
+
+# Starter catalog loaded by ``seed``; same format as ``flask --app app ingest-recipes`` input
+SEED_RECIPES_PATH = os.path.join(os.path.dirname(__file__), 'seed_data', 'recipes.jsonl')
 
 def init_mongo(app: Flask):
-    global mongo_client, mongo_db
-    mongo_client = MongoClient(app.config['MONGO_URI'])
-    mongo_db = mongo_client.get_database()
+    """
+    Point the lazily created Mongo client at the app's ``MONGO_URI``
 
-    # Register the MongoDB instance with Flask app
-    app.extensions['mongo_db'] = mongo_db
-    
-    # Seed recipes and ingredients if the collections are empty
-    if mongo_db.recipes.count_documents({}) == 0:
+    Nothing connects here. The client is built on first use in each process,
+    so a worker forked from a preloading master never shares its parent's
+    sockets.
+    """
+    global _mongo_uri, _mongo_client, _instrumented
+    _mongo_uri = app.config['MONGO_URI']
+    _instrumented = app.config['QUERY_INSTRUMENTATION']
+    _mongo_client = None
+    app.extensions['mongo_db'] = get_db
+
+def get_client():
+    """Return this process's ``MongoClient``, creating it after a fork"""
+    global _mongo_client, _mongo_pid
+    pid = os.getpid()
+    if _mongo_client is None or _mongo_pid != pid:
+        with _mongo_lock:
+            if _mongo_client is None or _mongo_pid != pid:
+                # Commands are recorded for benchmarks and profiling when enabled
+                listeners = [MongoCommandRecorder()] if _instrumented else []
+                _mongo_client = MongoClient(_mongo_uri, connect=False, event_listeners=listeners)
+                _mongo_pid = pid
+    return _mongo_client
+
+def get_db():
+    """Return the application database named in ``MONGO_URI``"""
+    return get_client().get_default_database('cookbookit')
+
+def seed_database():
+    """
+    Seed recipes and ingredients if their collections are empty
+
+    Returns:
+        list: Names of the collections that were seeded
+    """
+    db = get_db()
+    seeded = []
+    if db.recipes.count_documents({}, limit=1) == 0:
         seed_recipes()
+        seeded.append('recipes')
     
-    if mongo_db.ingredients.count_documents({}) == 0:
+    if db.ingredients.count_documents({}, limit=1) == 0:
         seed_ingredients()
+        seeded.append('ingredients')
     
-    return mongo_db
+    return seeded
 
 def seed_recipes():
-    global mongo_db
-    recipes = [
-        {
-            "name": "Spaghetti Carbonara",
-            "description": "Classic Italian pasta dish with eggs, cheese, pancetta and black pepper.",
-            "ingredients": [
-                {"name": "spaghetti", "amount": 400, "unit": "g"},
-                {"name": "pancetta", "amount": 150, "unit": "g"},
-                {"name": "egg", "amount": 3, "unit": "whole"},
-                {"name": "parmesan cheese", "amount": 50, "unit": "g"},
-                {"name": "black pepper", "amount": 2, "unit": "tsp"},
-                {"name": "salt", "amount": 1, "unit": "tsp"}
-            ],
-            "instructions": [
-                "Boil spaghetti in salted water until al dente.",
-                "Fry pancetta until crispy.",
-                "Beat eggs with grated parmesan cheese.",
-                "Drain pasta and mix with pancetta.",
-                "Quickly stir in egg mixture off the heat to create a creamy sauce.",
-                "Season with black pepper and serve immediately."
-            ],
-            "prep_time": 10,
-            "cook_time": 15,
-            "servings": 4,
-            "difficulty": "Medium",
-            "tags": ["italian", "pasta", "quick", "dinner"],
-            "dietary_info": {
-                "vegetarian": False,
-                "vegan": False,
-                "gluten_free": False,
-                "dairy_free": False
-            },
-            "nutrition": {
-                "calories": 450,
-                "protein": 20,
-                "carbs": 55,
-                "fat": 18
-            },
-            "image_url": "https://images.pexels.com/photos/6287447/pexels-photo-6287447.jpeg"
-        },
-        {
-            "name": "Vegetable Stir Fry",
-            "description": "Quick and healthy vegetable stir fry with a savory sauce.",
-            "ingredients": [
-                {"name": "broccoli", "amount": 1, "unit": "head"},
-                {"name": "carrot", "amount": 2, "unit": "whole"},
-                {"name": "bell pepper", "amount": 1, "unit": "whole"},
-                {"name": "onion", "amount": 1, "unit": "whole"},
-                {"name": "garlic", "amount": 2, "unit": "cloves"},
-                {"name": "soy sauce", "amount": 2, "unit": "tbsp"},
-                {"name": "sesame oil", "amount": 1, "unit": "tbsp"},
-                {"name": "rice", "amount": 2, "unit": "cups"}
-            ],
-            "instructions": [
-                "Chop all vegetables into bite-sized pieces.",
-                "Heat oil in a wok or large frying pan.",
-                "Add garlic and onion, stir fry until fragrant.",
-                "Add remaining vegetables and stir fry until crisp-tender.",
-                "Add soy sauce and sesame oil, toss to combine.",
-                "Serve hot over cooked rice."
-            ],
-            "prep_time": 15,
-            "cook_time": 10,
-            "servings": 4,
-            "difficulty": "Easy",
-            "tags": ["vegetarian", "asian", "quick", "healthy"],
-            "dietary_info": {
-                "vegetarian": True,
-                "vegan": True,
-                "gluten_free": False,
-                "dairy_free": True
-            },
-            "nutrition": {
-                "calories": 320,
-                "protein": 8,
-                "carbs": 60,
-                "fat": 6
-            },
-            "image_url": "https://images.pexels.com/photos/1640774/pexels-photo-1640774.jpeg"
-        },
-        {
-            "name": "Avocado Toast",
-            "description": "Simple and nutritious breakfast with avocado on toast.",
-            "ingredients": [
-                {"name": "bread", "amount": 2, "unit": "slices"},
-                {"name": "avocado", "amount": 1, "unit": "whole"},
-                {"name": "lemon juice", "amount": 1, "unit": "tsp"},
-                {"name": "salt", "amount": 0.5, "unit": "tsp"},
-                {"name": "red pepper flakes", "amount": 0.25, "unit": "tsp"},
-                {"name": "egg", "amount": 2, "unit": "whole"}
-            ],
-            "instructions": [
-                "Toast bread until golden and crisp.",
-                "Mash avocado with lemon juice and salt.",
-                "Fry eggs sunny-side up.",
-                "Spread avocado mixture on toast.",
-                "Top with fried egg and sprinkle with red pepper flakes."
-            ],
-            "prep_time": 5,
-            "cook_time": 5,
-            "servings": 2,
-            "difficulty": "Easy",
-            "tags": ["breakfast", "vegetarian", "quick", "healthy"],
-            "dietary_info": {
-                "vegetarian": True,
-                "vegan": False,
-                "gluten_free": False,
-                "dairy_free": True
-            },
-            "nutrition": {
-                "calories": 280,
-                "protein": 10,
-                "carbs": 20,
-                "fat": 18
-            },
-            "image_url": "https://images.pexels.com/photos/704569/pexels-photo-704569.jpeg"
-        },
-        {
-            "name": "Vegetarian Chili",
-            "description": "Hearty and flavorful vegetarian chili with beans and vegetables.",
-            "ingredients": [
-                {"name": "kidney beans", "amount": 400, "unit": "g"},
-                {"name": "black beans", "amount": 400, "unit": "g"},
-                {"name": "onion", "amount": 1, "unit": "large"},
-                {"name": "bell pepper", "amount": 2, "unit": "whole"},
-                {"name": "garlic", "amount": 3, "unit": "cloves"},
-                {"name": "diced tomatoes", "amount": 800, "unit": "g"},
-                {"name": "tomato paste", "amount": 2, "unit": "tbsp"},
-                {"name": "chili powder", "amount": 2, "unit": "tbsp"},
-                {"name": "cumin", "amount": 1, "unit": "tbsp"},
-                {"name": "paprika", "amount": 1, "unit": "tsp"}
-            ],
-            "instructions": [
-                "Dice onion and bell peppers, mince garlic.",
-                "Sauté onion, bell peppers, and garlic until soft.",
-                "Add spices and cook until fragrant.",
-                "Add beans, diced tomatoes, and tomato paste.",
-                "Simmer for 30 minutes, stirring occasionally.",
-                "Serve hot with optional toppings like cheese, sour cream, or avocado."
-            ],
-            "prep_time": 15,
-            "cook_time": 40,
-            "servings": 6,
-            "difficulty": "Medium",
-            "tags": ["vegetarian", "dinner", "healthy", "meal prep"],
-            "dietary_info": {
-                "vegetarian": True,
-                "vegan": True,
-                "gluten_free": True,
-                "dairy_free": True
-            },
-            "nutrition": {
-                "calories": 320,
-                "protein": 15,
-                "carbs": 55,
-                "fat": 4
-            },
-            "image_url": "https://images.pexels.com/photos/4202392/pexels-photo-4202392.jpeg"
-        },
-        {
-            "name": "Chicken Salad",
-            "description": "Fresh and protein-packed chicken salad with mixed greens and homemade dressing.",
-            "ingredients": [
-                {"name": "chicken breast", "amount": 2, "unit": "whole"},
-                {"name": "mixed greens", "amount": 200, "unit": "g"},
-                {"name": "cherry tomatoes", "amount": 100, "unit": "g"},
-                {"name": "cucumber", "amount": 1, "unit": "whole"},
-                {"name": "red onion", "amount": 0.5, "unit": "whole"},
-                {"name": "olive oil", "amount": 2, "unit": "tbsp"},
-                {"name": "lemon juice", "amount": 1, "unit": "tbsp"},
-                {"name": "mustard", "amount": 1, "unit": "tsp"},
-                {"name": "honey", "amount": 1, "unit": "tsp"},
-                {"name": "salt", "amount": 0.5, "unit": "tsp"},
-                {"name": "black pepper", "amount": 0.25, "unit": "tsp"}
-            ],
-            "instructions": [
-                "Season chicken breasts with salt and pepper and grill until cooked through.",
-                "Wash and prep all vegetables.",
-                "Slice cucumber and red onion, halve cherry tomatoes.",
-                "Whisk together olive oil, lemon juice, mustard, honey, salt, and pepper for the dressing.",
-                "Slice cooled chicken breast.",
-                "Combine all ingredients in a large bowl, drizzle with dressing, and toss gently."
-            ],
-            "prep_time": 15,
-            "cook_time": 15,
-            "servings": 2,
-            "difficulty": "Easy",
-            "tags": ["salad", "protein", "healthy", "lunch"],
-            "dietary_info": {
-                "vegetarian": False,
-                "vegan": False,
-                "gluten_free": True,
-                "dairy_free": True
-            },
-            "nutrition": {
-                "calories": 350,
-                "protein": 30,
-                "carbs": 15,
-                "fat": 18
-            },
-            "image_url": "https://images.pexels.com/photos/5938/food-salad-healthy-lunch.jpg"
-        }
-    ]
-
-    mongo_db.recipes.insert_many(recipes)
+    # Imported here; only the seed commands need the ingestion pipeline
+    from database.ingest import ingest_recipes
+    
+    return ingest_recipes(SEED_RECIPES_PATH)
 
 def seed_ingredients():
-    global mongo_db
     ingredients = [
         {"name": "spaghetti", "category": "pasta", "unit": "g"},
         {"name": "pancetta", "category": "meat", "unit": "g"},
@@ -268,4 +108,4 @@ def seed_ingredients():
         {"name": "honey", "category": "sweetener", "unit": "tsp"}
     ]
 
-    mongo_db.ingredients.insert_many(ingredients)
\ No newline at end of file
+    get_db().ingredients.insert_many(ingredients)
\ No newline at end of file
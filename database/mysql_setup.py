@@ -1,39 +1,211 @@
+import os
+import threading
+import time
+from collections import deque
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from flask import g, has_app_context
 from config import Config
+from database.instrumentation import InstrumentedConnection
+
+mysql_pool = None
+_pool_config = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_thread_local = threading.local()
+
+class PooledConnection:
+    """Wraps a raw MySQL connection with the bookkeeping the pool needs."""
+    
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
 
-mysql_connection = None
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections
+    
+    Connections are opened lazily up to ``size``. A checkout blocks for at
+    most ``timeout`` seconds before raising ``PoolError``. Connections older
+    than ``recycle`` seconds are replaced, and connections that sat idle for
+    longer than ``health_check_after`` seconds are pinged before reuse.
+    """
+    
+    def __init__(self, size, timeout, recycle, health_check_after, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_after = health_check_after
+        self.connect_args = connect_args
+        self._idle = deque()
+        self._opened = 0
+        # Guards _idle and _opened; notified whenever a connection or a slot frees up
+        self._available = threading.Condition(threading.Lock())
+    
+    def _open(self):
+        return PooledConnection(mysql.connector.connect(**self.connect_args))
+    
+    def _free_slot(self):
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+    
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Error:
+            pass
+        self._free_slot()
+    
+    def _is_usable(self, conn):
+        now = time.monotonic()
+        if self.recycle and now - conn.created_at > self.recycle:
+            return False
+        if now - conn.last_used > self.health_check_after:
+            return conn.raw.is_connected()
+        return True
+    
+    def _reserve(self, deadline):
+        """
+        Wait for an idle connection or room to open one
+        
+        Returns:
+            PooledConnection: An idle connection, or None when a slot was
+            reserved and the caller must open the connection itself
+        """
+        with self._available:
+            while True:
+                # Every wakeup re-checks both, so a slot freed by a discard is
+                # claimed just like a returned connection
+                if self._idle:
+                    return self._idle.popleft()
+                if self._opened < self.size:
+                    self._opened += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"Timed out after {self.timeout}s waiting for a MySQL connection")
+                self._available.wait(remaining)
+    
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = self._reserve(deadline)
+            if conn is None:
+                try:
+                    return self._open()
+                except Error:
+                    self._free_slot()
+                    raise
+            # Health checks may ping the server, so they run outside the lock
+            if self._is_usable(conn):
+                return conn
+            self._discard(conn)
+    
+    def release(self, conn):
+        try:
+            # Never hand a half-finished transaction to the next request
+            if conn.raw.in_transaction:
+                conn.raw.rollback()
+        except Error:
+            self._discard(conn)
+            return
+        
+        conn.last_used = time.monotonic()
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
 
 def init_mysql(app):
-    global mysql_connection
+    """
+    Configure the MySQL pool for the app without opening any connections
+    
+    Connections are opened on first checkout, and a process that finds a
+    pool inherited from its parent (a forked worker) builds its own.
+    """
+    global mysql_pool, _pool_pid, _pool_config
+    _pool_config = app.config
+    mysql_pool = _build_pool(_pool_config)
+    _pool_pid = os.getpid()
+    
+    # Return each request's connection to the pool when its context ends
+    app.teardown_appcontext(release_connection)
+    
+    return mysql_pool
+
+def _build_pool(config):
+    return ConnectionPool(
+        size=config['MYSQL_POOL_SIZE'],
+        timeout=config['MYSQL_POOL_TIMEOUT'],
+        recycle=config['MYSQL_POOL_RECYCLE'],
+        health_check_after=config['MYSQL_POOL_HEALTH_CHECK_AFTER'],
+        host=config['MYSQL_HOST'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        database=config['MYSQL_DB']
+    )
+
+def create_database(config):
+    """Create the application database if it doesn't exist yet"""
     try:
-        mysql_connection = mysql.connector.connect(
-            host=app.config['MYSQL_HOST'],
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD']
+        bootstrap = mysql.connector.connect(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD']
         )
-        
-        # Create database if it doesn't exist
-        cursor = mysql_connection.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {app.config['MYSQL_DB']}")
-        cursor.execute(f"USE {app.config['MYSQL_DB']}")
+        cursor = bootstrap.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {config['MYSQL_DB']}")
         cursor.close()
-        
-        return mysql_connection
+        bootstrap.close()
+        return True
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+        print(f"Error creating MySQL database: {e}")
+        return False
+
+def get_pool():
+    global mysql_pool, _pool_pid, _thread_local
+    pid = os.getpid()
+    if mysql_pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if mysql_pool is None or _pool_pid != pid:
+                # Connections inherited across a fork belong to the parent
+                mysql_pool = _build_pool(_pool_config or vars(Config))
+                _thread_local = threading.local()
+                _pool_pid = pid
+    return mysql_pool
 
 def get_connection():
-    global mysql_connection
-    if mysql_connection is None or not mysql_connection.is_connected():
-        mysql_connection = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DB
-        )
-    return mysql_connection
+    """
+    Get the MySQL connection for the current request
+    
+    Inside an app context the connection is checked out once and kept on
+    ``flask.g`` until teardown returns it to the pool. Outside an app context
+    (startup, scripts) each thread keeps its own checked-out connection.
+    """
+    if has_app_context():
+        conn = g.get('mysql_conn')
+        if conn is None:
+            conn = get_pool().checkout()
+            g.mysql_conn = conn
+    else:
+        pool = get_pool()
+        conn = getattr(_thread_local, 'conn', None)
+        if conn is None:
+            conn = pool.checkout()
+            _thread_local.conn = conn
+    
+    # Statements are recorded for benchmarks and profiling when enabled
+    if (_pool_config or vars(Config)).get('QUERY_INSTRUMENTATION'):
+        return InstrumentedConnection(conn.raw)
+    return conn.raw
+
+def release_connection(exception=None):
+    conn = g.pop('mysql_conn', None)
+    if conn is not None:
+        get_pool().release(conn)
 
 def create_tables():
     conn = get_connection()
@@ -0,0 +1,128 @@
+import re
+import time
+from collections import Counter
+
+from flask import g, request
+
+from database.instrumentation import QueryLog
+
+# Round trips that legitimately repeat within a request
+_NOT_REPEATS = ('COMMIT', 'ROLLBACK', 'getMore ')
+
+# Literals that differ between otherwise identical statements. A quoted string
+# followed by a colon is a dict key (a field name) and is kept; strings are
+# matched first so digits inside a key aren't taken for numbers.
+_OBJECT_ID = re.compile(r"ObjectId\('[0-9a-f]{24}'\)")
+_LITERAL = re.compile(
+    r"(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")(?P<key>\s*:)?"
+    r"|\b\d+(?:\.\d+)?\b"
+)
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_VALUE_LIST = re.compile(r"\[\s*(?:ObjectId\(\?\)|\?)(?:\s*,\s*(?:ObjectId\(\?\)|\?))*\s*\]")
+
+def statement_shape(statement):
+    """
+    Reduce a statement to its shape so repeats with different values match
+
+    MySQL statements are already parameterized. Mongo commands carry their
+    values inline, so ids, string values and numbers are masked while field
+    names are kept. ``IN (%s, %s, ...)`` lists and Mongo lists of masked
+    values are collapsed so their length doesn't matter.
+    """
+    shape = _PLACEHOLDER_LIST.sub("(%s...)", statement)
+    shape = _OBJECT_ID.sub("ObjectId(?)", shape)
+    shape = _LITERAL.sub(_mask_literal, shape)
+    shape = _VALUE_LIST.sub("[?...]", shape)
+    return " ".join(shape.split())
+
+def _mask_literal(match):
+    if match.group('key'):
+        return match.group(0)
+    return "?"
+
+def repeated_statements(log, threshold):
+    """
+    Statement shapes run at least ``threshold`` times in one log
+
+    A query repeated once per row of an earlier result (an N+1 pattern)
+    shows up here.
+
+    Returns:
+        list: (shape, count) pairs, most repeated first
+    """
+    counts = Counter(
+        statement_shape(statement)
+        for _, statement, _ in log.entries
+        if not statement.startswith(_NOT_REPEATS)
+    )
+    return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+def server_timing(log, total_ms):
+    """Build a ``Server-Timing`` header value for the request"""
+    parts = []
+    for kind, label in (('mysql', 'MySQL'), ('mongo', 'MongoDB')):
+        count = log.count(kind)
+        if count:
+            parts.append(f'{kind};dur={log.total_ms(kind):.1f};desc="{label} x{count}"')
+    parts.append(f'app;dur={total_ms:.1f}')
+    return ", ".join(parts)
+
+def init_profiler(app):
+    """
+    Profile the database work of every request when ``PROFILE_REQUESTS`` is on
+
+    Each request records its MySQL statements and Mongo commands (including
+    those run by page loader threads), reports them in a ``Server-Timing``
+    header, and logs a warning with the offending statements when it
+    exceeds ``SLOW_REQUEST_MS`` or ``SLOW_REQUEST_QUERIES``, or repeats one
+    statement ``REPEATED_QUERY_THRESHOLD`` times or more.
+
+    Must run before ``init_mongo`` and ``init_mysql``, which read
+    ``QUERY_INSTRUMENTATION`` when building their clients.
+    """
+    if not app.config['PROFILE_REQUESTS']:
+        return
+    app.config['QUERY_INSTRUMENTATION'] = True
+
+    @app.before_request
+    def start_profile():
+        g.query_log = QueryLog().__enter__()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_profile(response):
+        log = g.get('query_log')
+        if log is None:
+            return response
+
+        total_ms = (time.perf_counter() - g.request_started) * 1000
+        response.headers.add('Server-Timing', server_timing(log, total_ms))
+        _log_problems(app, log, total_ms)
+        return response
+
+    @app.teardown_request
+    def stop_profile(exception=None):
+        log = g.pop('query_log', None)
+        if log is not None:
+            log.__exit__(None, None, None)
+
+def _log_problems(app, log, total_ms):
+    problems = []
+    if total_ms > app.config['SLOW_REQUEST_MS']:
+        problems.append(f"took {total_ms:.0f} ms")
+    if len(log.entries) > app.config['SLOW_REQUEST_QUERIES']:
+        problems.append(f"ran {len(log.entries)} queries")
+    repeats = repeated_statements(log, app.config['REPEATED_QUERY_THRESHOLD'])
+    if repeats:
+        problems.append(f"repeated {len(repeats)} statement(s), a likely N+1")
+    if not problems:
+        return
+
+    lines = [f"{request.method} {request.path} {', '.join(problems)} "
+             f"(mysql {log.count('mysql')} in {log.total_ms('mysql'):.1f} ms, "
+             f"mongo {log.count('mongo')} in {log.total_ms('mongo'):.1f} ms)"]
+    for shape, count in repeats:
+        lines.append(f"  repeated x{count}: {shape}")
+    for kind, statement, duration_ms in sorted(log.entries, key=lambda entry: entry[2], reverse=True)[:10]:
+        lines.append(f"  {duration_ms:8.1f} ms {kind}: {' '.join(statement.split())[:300]}")
+    app.logger.warning("\n".join(lines))
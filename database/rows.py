@@ -0,0 +1,29 @@
+class RowModel:
+    """
+    Base for slotted models of one MySQL table's rows
+
+    Subclasses list their ``COLUMNS`` in constructor argument order, so rows
+    from a plain tuple cursor map straight onto the constructor without a
+    dict per row. Subclasses declare ``__slots__`` as well, which keeps each
+    instance free of a ``__dict__``.
+    """
+
+    __slots__ = ()
+
+    TABLE = None
+    COLUMNS = ()
+
+    @classmethod
+    def select(cls, clause=""):
+        """Build ``SELECT <COLUMNS> FROM <TABLE> <clause>``"""
+        return f"SELECT {', '.join(cls.COLUMNS)} FROM {cls.TABLE} {clause}"
+
+    @classmethod
+    def from_row(cls, row):
+        """Build one model from a tuple row, or return None for a missing row"""
+        return cls(*row) if row is not None else None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a model for every tuple row"""
+        return [cls(*row) for row in rows]
@@ -0,0 +1,40 @@
+import os
+import time
+
+from config import Config
+
+# Import the app once in the master; workers share its memory copy-on-write
+preload_app = True
+wsgi_app = 'app:app'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+_forked_at = {}
+
+def when_ready(server):
+    from app import app
+    server.log.info("App loaded in %.0f ms", app.config['BOOT_TIME_MS'])
+
+    # Every request thread holds a connection and page loader threads take more
+    needed = threads + max(Config.PAGE_LOADER_WORKERS, 0)
+    if Config.MYSQL_POOL_SIZE < needed:
+        server.log.warning("MYSQL_POOL_SIZE is %d but each worker may need %d connections "
+                           "(%d threads + %d page loader workers); requests may wait for connections",
+                           Config.MYSQL_POOL_SIZE, needed, threads, Config.PAGE_LOADER_WORKERS)
+    server.log.info("Each worker holds up to %d MySQL connections, %d across %d workers",
+                    min(needed, Config.MYSQL_POOL_SIZE), workers * min(needed, Config.MYSQL_POOL_SIZE), workers)
+
+def pre_fork(server, worker):
+    _forked_at[worker.age] = time.perf_counter()
+
+def post_fork(server, worker):
+    # The worker's copy of the map still holds its own fork time
+    worker.boot_started = _forked_at.pop(worker.age, time.perf_counter())
+
+def post_worker_init(worker):
+    boot_ms = (time.perf_counter() - worker.boot_started) * 1000
+    if boot_ms > Config.BOOT_TIME_BUDGET_MS:
+        worker.log.warning("Worker %s booted in %.0f ms, over the %.0f ms budget",
+                           worker.pid, boot_ms, Config.BOOT_TIME_BUDGET_MS)
+    else:
+        worker.log.info("Worker %s booted in %.0f ms", worker.pid, boot_ms)
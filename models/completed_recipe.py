@@ -1,9 +1,25 @@
 from database.mysql_setup import get_connection
+from database.rows import RowModel
 from models.recipe import Recipe
 from models.inventory import Inventory
+from models import units
 from datetime import datetime
 
-class CompletedRecipe:
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+class CompletedRecipe(RowModel):
+    TABLE = 'completed_recipes'
+    COLUMNS = ('id', 'user_id', 'recipe_id', 'completed_date', 'servings_made')
+    __slots__ = COLUMNS + ('recipe',)
+    
+    PAGE_CLAUSE = "WHERE user_id = %s ORDER BY completed_date DESC, id DESC LIMIT %s"
+    PAGE_AFTER_CLAUSE = """
+        WHERE user_id = %s
+        AND (completed_date < %s OR (completed_date = %s AND id < %s))
+        ORDER BY completed_date DESC, id DESC
+        LIMIT %s
+        """
+    
     def __init__(self, id, user_id, recipe_id, completed_date, servings_made):
         self.id = id
         self.user_id = user_id
@@ -13,42 +29,68 @@ class CompletedRecipe:
         self.recipe = None
     
     @staticmethod
-    def get_by_user(user_id, limit=10):
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+    def get_by_user(user_id, limit=10, before=None):
+        """
+        Get a page of a user's cooking history, newest first
         
-        cursor.execute(
-            """
-            SELECT * FROM completed_recipes 
-            WHERE user_id = %s 
-            ORDER BY completed_date DESC
-            LIMIT %s
-            """,
-            (user_id, limit)
-        )
+        Args:
+            user_id (int): User ID
+            limit (int): Maximum number of rows to return
+            before (tuple, optional): Keyset cursor ``(completed_date, id)``;
+                only rows strictly older than it are returned
+            
+        Returns:
+            list: CompletedRecipe objects with ``recipe`` populated
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
         
-        completed_recipes = []
-        for data in cursor.fetchall():
-            completed = CompletedRecipe(
-                id=data['id'],
-                user_id=data['user_id'],
-                recipe_id=data['recipe_id'],
-                completed_date=data['completed_date'],
-                servings_made=data['servings_made']
+        if before:
+            before_date, before_id = before
+            cursor.execute(
+                CompletedRecipe.select(CompletedRecipe.PAGE_AFTER_CLAUSE),
+                (user_id, before_date, before_date, before_id, limit)
             )
-            
-            # Get recipe details
-            recipe = Recipe.get_by_id(data['recipe_id'])
-            if recipe:
-                completed.recipe = recipe
-            
-            completed_recipes.append(completed)
+        else:
+            cursor.execute(CompletedRecipe.select(CompletedRecipe.PAGE_CLAUSE), (user_id, limit))
         
+        completed_recipes = CompletedRecipe.from_rows(cursor.fetchall())
         cursor.close()
+        
+        # Resolve the distinct recipes for the whole page in one query
+        recipes = Recipe.get_many(completed.recipe_id for completed in completed_recipes)
+        for completed in completed_recipes:
+            completed.recipe = recipes.get(completed.recipe_id)
+        
         return completed_recipes
     
+    @staticmethod
+    def encode_cursor(completed):
+        """Build the opaque pagination cursor pointing just past ``completed``"""
+        return f"{completed.completed_date.strftime(CURSOR_DATE_FORMAT)}_{completed.id}"
+    
+    @staticmethod
+    def decode_cursor(cursor_value):
+        """
+        Parse a cursor produced by ``encode_cursor``
+        
+        Returns:
+            tuple: ``(completed_date, id)``, or None if the cursor is malformed
+        """
+        if not cursor_value:
+            return None
+        
+        try:
+            date_part, id_part = cursor_value.rsplit('_', 1)
+            return datetime.strptime(date_part, CURSOR_DATE_FORMAT), int(id_part)
+        except ValueError:
+            return None
+    
     @staticmethod
     def mark_completed(user_id, recipe_id, servings_made=1):
+        recipe = Recipe.get_by_id(recipe_id)
+        usage = CompletedRecipe.ingredient_usage(recipe, servings_made) if recipe else {}
+        
         conn = get_connection()
         cursor = conn.cursor()
         
@@ -61,12 +103,14 @@ class CompletedRecipe:
                 """,
                 (user_id, recipe_id, servings_made)
             )
-            conn.commit()
             completed_id = cursor.lastrowid
-            cursor.close()
             
-            # Update inventory based on recipe ingredients used
-            CompletedRecipe.update_inventory(user_id, recipe_id, servings_made)
+            # Update inventory based on recipe ingredients used, in the same transaction
+            Inventory.deduct_many(cursor, user_id, usage)
+            
+            conn.commit()
+            cursor.close()
+            Inventory.invalidate(user_id)
             
             return completed_id
         except Exception as e:
@@ -76,26 +120,66 @@ class CompletedRecipe:
             return None
     
     @staticmethod
-    def update_inventory(user_id, recipe_id, servings_made):
-        # Get recipe details
-        recipe = Recipe.get_by_id(recipe_id)
-        if not recipe:
-            return False
+    def ingredient_usage(recipe, servings_made):
+        """
+        Work out how much of each ingredient cooking a recipe uses
         
-        # Get recipe ingredients
-        ingredients = recipe.get('ingredients', [])
+        Args:
+            recipe (dict): Recipe document
+            servings_made (int): Servings cooked
+            
+        Returns:
+            dict: Ingredient name -> dict with the ``amount``/``unit`` used
+            and the same amount as ``base_amount``/``base_unit``
+        """
         recipe_servings = recipe.get('servings', 1)
+        if recipe_servings <= 0:
+            return {}
+        
+        scale = servings_made / recipe_servings
         
         # Calculate ingredient amounts based on servings made
-        for ingredient in ingredients:
+        usage = {}
+        for ingredient in recipe.get('ingredients', []):
             ingredient_name = ingredient.get('name')
-            amount = ingredient.get('amount', 0)
+            amount_used = ingredient.get('amount', 0) * scale
+            unit = ingredient.get('unit', '')
+            base_amount, base_unit = units.normalize(amount_used, unit, ingredient_name)
             
-            # Calculate amount used based on servings
-            if recipe_servings > 0:
-                amount_used = (amount / recipe_servings) * servings_made
-                
-                # Decrease inventory (negative value because we're removing)
-                Inventory.update_quantity(user_id, ingredient_name, -amount_used)
+            used = usage.get(ingredient_name)
+            if used is None:
+                usage[ingredient_name] = {
+                    'amount': amount_used,
+                    'unit': unit,
+                    'base_amount': base_amount,
+                    'base_unit': base_unit
+                }
+            elif used['base_unit'] == base_unit:
+                used['amount'] += units.from_base(base_amount, used['unit'], ingredient_name)
+                used['base_amount'] += base_amount
+            else:
+                used['amount'] += amount_used
+        
+        return usage
+    
+    @staticmethod
+    def update_inventory(user_id, recipe_id, servings_made):
+        # Get recipe details
+        recipe = Recipe.get_by_id(recipe_id)
+        if not recipe:
+            return False
+        
+        conn = get_connection()
+        cursor = conn.cursor()
         
-        return True
\ No newline at end of file
+        try:
+            Inventory.deduct_many(cursor, user_id, CompletedRecipe.ingredient_usage(recipe, servings_made))
+            conn.commit()
+            cursor.close()
+            Inventory.invalidate(user_id)
+            return True
+        except Exception as e:
+            conn.rollback()
+            cursor.close()
+            print(f"Error updating inventory: {e}")
+            return False
\ No newline at end of file
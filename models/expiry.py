@@ -0,0 +1,81 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# One dated inventory row; tuples sort by expiry date first
+ExpiringItem = namedtuple('ExpiringItem', ['expiry_date', 'id', 'ingredient_name'])
+
+def expiry_weights(items, today=None):
+    """
+    Weight ingredients by how soon they expire
+
+    Args:
+        items (iterable): Objects with ``ingredient_name`` and ``expiry_date``
+        today (date, optional): Reference date, defaults to today
+
+    Returns:
+        dict: Ingredient name -> weight, 1 for today and ``1 / (1 + days)``
+        after that. Items already past their date are left out.
+    """
+    today = today or datetime.now().date()
+    weights = {}
+    for item in items:
+        if item.expiry_date is None:
+            continue
+        days_left = (item.expiry_date - today).days
+        if days_left >= 0:
+            weights[item.ingredient_name] = max(weights.get(item.ingredient_name, 0), 1 / (1 + days_left))
+    return weights
+
+class ExpiryQueue:
+    """
+    One user's dated inventory rows kept sorted by expiry date
+
+    Built from a single query and then updated in place by inventory writes,
+    so "what expires soon" is a binary search instead of a table scan.
+    """
+
+    def __init__(self, items=()):
+        self._items = sorted(items)
+        self._by_id = {item.id: item for item in self._items}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def upsert(self, item_id, ingredient_name, expiry_date):
+        """Track an inventory row, or stop tracking it when it has no expiry date"""
+        with self._lock:
+            self._discard(item_id)
+            if expiry_date is not None:
+                item = ExpiringItem(expiry_date, item_id, ingredient_name)
+                insort(self._items, item)
+                self._by_id[item_id] = item
+
+    def remove(self, item_ids):
+        """Stop tracking deleted inventory rows"""
+        with self._lock:
+            for item_id in item_ids:
+                self._discard(item_id)
+
+    def _discard(self, item_id):
+        item = self._by_id.pop(item_id, None)
+        if item is not None:
+            position = bisect_left(self._items, item)
+            del self._items[position]
+
+    def expiring(self, days, today=None):
+        """
+        Rows expiring within ``days`` of today, soonest first
+
+        Rows already past their date are included, like ``Inventory.get_expiring_items``.
+        """
+        today = today or datetime.now().date()
+        cutoff = ExpiringItem(today + timedelta(days=days), float('inf'), '')
+        with self._lock:
+            return self._items[:bisect_right(self._items, cutoff)]
+
+    def weights(self, days, today=None):
+        """``expiry_weights`` of the rows expiring within ``days``"""
+        return expiry_weights(self.expiring(days, today), today)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from models import units
+
+def aggregate_ingredients(recipes):
+    """
+    Sum the ingredients of many recipes per ingredient and base unit
+
+    Every ingredient is flattened into columnar arrays (key, base amount)
+    and group-summed with NumPy.
+
+    Args:
+        recipes (iterable): Recipe documents; repeat a recipe to count it twice
+
+    Returns:
+        list: ``(name, base_unit, unit, base_amount)`` tuples in first-seen
+        order, where ``unit`` is the first raw unit seen for the ingredient
+    """
+    key_ids = {}           # (name, base unit) -> key number
+    keys = []
+    key_units = []         # unit shown to the user, the first one seen
+    planned_keys = []
+    planned_amounts = []
+
+    for recipe in recipes:
+        for ingredient in recipe.get('ingredients', []):
+            name = ingredient.get('name')
+            base_amount = ingredient.get('base_amount')
+            base_unit = ingredient.get('base_unit')
+            if base_unit is None:
+                base_amount, base_unit = units.normalize(ingredient.get('amount', 0), ingredient.get('unit', ''), name)
+
+            key = (name, base_unit)
+            key_id = key_ids.get(key)
+            if key_id is None:
+                key_id = key_ids[key] = len(keys)
+                keys.append(key)
+                key_units.append(ingredient.get('unit', ''))
+
+            planned_keys.append(key_id)
+            planned_amounts.append(base_amount or 0)
+
+    if not keys:
+        return []
+
+    totals = np.bincount(
+        np.asarray(planned_keys, dtype=np.intp),
+        weights=np.asarray(planned_amounts, dtype=np.float64),
+        minlength=len(keys)
+    )
+
+    return [
+        (name, base_unit, unit, total)
+        for (name, base_unit), unit, total in zip(keys, key_units, totals.tolist())
+    ]
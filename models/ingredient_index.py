@@ -0,0 +1,232 @@
+import threading
+from bisect import bisect_right
+import time
+from array import array
+
+import numpy as np
+
+# Bit positions for the dietary flags stored per recipe
+DIETARY_KEYS = ('vegetarian', 'vegan', 'gluten_free', 'dairy_free')
+
+def dietary_mask(dietary_filters):
+    """Turn a ``{'vegan': True, ...}`` filter dict into a bitmask of required flags"""
+    mask = 0
+    for bit, key in enumerate(DIETARY_KEYS):
+        if dietary_filters and dietary_filters.get(key):
+            mask |= 1 << bit
+    return mask
+
+class IngredientIndex:
+    """
+    In-memory inverted index from ingredient name to the recipes using it
+
+    Recipes are numbered densely at build time in ``_id`` order. Each ingredient maps to a
+    NumPy array of those numbers, and the number of ingredients per recipe is
+    precomputed, so match percentages come from one ``bincount`` over the
+    user's posting lists instead of loading and rescanning recipe documents.
+    """
+
+    def __init__(self):
+        self.recipe_ids = []              # recipe number -> ObjectId
+        self.recipe_names = []            # recipe number -> name, for lightweight listings
+        self.ingredient_counts = np.zeros(0, dtype=np.float64)
+        self.dietary_flags = np.zeros(0, dtype=np.uint8)   # recipe number -> dietary bitmask
+        self.postings = {}                # ingredient name -> int32 array of recipe numbers
+
+    @classmethod
+    def build(cls, collection):
+        index = cls()
+        postings = {}
+        counts = array('H')
+        flags = array('B')
+
+        projection = {"name": 1, "ingredients.name": 1, "dietary_info": 1}
+        for recipe in collection.find({}, projection).sort("_id", 1):
+            number = len(index.recipe_ids)
+            names = {i.get("name") for i in recipe.get("ingredients", []) if i.get("name")}
+
+            index.recipe_ids.append(recipe["_id"])
+            index.recipe_names.append(recipe.get("name", ""))
+            counts.append(len(recipe.get("ingredients", [])))
+            flags.append(dietary_mask(recipe.get("dietary_info")))
+
+            for name in names:
+                postings.setdefault(name, array('i')).append(number)
+
+        # Grown as compact arrays, then viewed as NumPy arrays for scoring
+        index.ingredient_counts = np.array(counts, dtype=np.float64)
+        index.dietary_flags = np.array(flags, dtype=np.uint8)
+        index.postings = {name: np.frombuffer(posting, dtype=np.int32) for name, posting in postings.items()}
+        return index
+
+    def position_after(self, recipe_id):
+        """Number of the first recipe whose ``_id`` sorts after ``recipe_id``"""
+        return bisect_right(self.recipe_ids, recipe_id)
+
+    def _postings(self, names):
+        postings = [self.postings[name] for name in set(names or ()) if name in self.postings]
+        if not postings:
+            return None
+        return np.concatenate(postings)
+
+    def _match_percentages(self, ingredient_names, exclude_ingredients, dietary_filters):
+        """
+        Score every recipe using one of ``ingredient_names``
+
+        Returns:
+            tuple: ``(recipe_numbers, match_percentages)`` arrays, in catalog order
+        """
+        hits = self._postings(ingredient_names)
+        if hits is None:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float64)
+        hits = np.bincount(hits, minlength=len(self.recipe_ids))
+
+        keep = hits > 0
+        excluded = self._postings(exclude_ingredients)
+        if excluded is not None:
+            keep[excluded] = False
+        required = dietary_mask(dietary_filters)
+        if required:
+            keep &= (self.dietary_flags & required) == required
+
+        numbers = np.flatnonzero(keep)
+        return numbers, (hits[numbers] / self.ingredient_counts[numbers]) * 100
+
+    def _top(self, numbers, scores, limit, after):
+        """
+        Positions in ``numbers``/``scores`` of one page of results, best score first
+
+        Ties keep catalog (_id) order, like the stable sort this replaced.
+        """
+        positions = np.arange(len(numbers))
+        if after:
+            after_score, after_id = after
+            start = self.position_after(after_id)
+            positions = np.flatnonzero((scores < after_score) | ((scores == after_score) & (numbers >= start)))
+
+        if limit is not None and 0 < limit < len(positions):
+            # Only recipes scoring at least the limit-th best score can make the page
+            kth = -np.partition(-scores[positions], limit - 1)[limit - 1]
+            positions = positions[scores[positions] >= kth]
+
+        # Positions are in catalog order, so a stable sort keeps ties in _id order
+        positions = positions[np.argsort(-scores[positions], kind='stable')]
+        return positions if limit is None else positions[:limit]
+
+    def top_matches(self, ingredient_names, exclude_ingredients=None, limit=None, dietary_filters=None, after=None):
+        """
+        Rank recipes by the share of their ingredients found in ``ingredient_names``
+
+        Args:
+            ingredient_names (iterable): Ingredients the user has
+            exclude_ingredients (iterable, optional): Recipes using any of
+                these are left out
+            limit (int, optional): Keep only the best ``limit`` matches
+            dietary_filters (dict, optional): Dietary flags a recipe must have
+            after (tuple, optional): Keyset ``(match_percentage, recipe_id)``
+                of the last result on the previous page
+
+        Returns:
+            list: ``(recipe_number, match_percentage)`` tuples, best first
+        """
+        numbers, percentages = self._match_percentages(ingredient_names, exclude_ingredients, dietary_filters)
+        page = self._top(numbers, percentages, limit, after)
+        return list(zip(numbers[page].tolist(), percentages[page].tolist()))
+
+    def top_boosted(self, ingredient_names, boosts, exclude_ingredients=None, limit=None, dietary_filters=None,
+                    after=None):
+        """
+        Rank recipes by match percentage scaled up by the boosted ingredients they use
+
+        A recipe's score is ``match_percentage * (1 + sum of its boosts)``, so
+        recipes that use up weighted stock (e.g. soon-to-expire items) rise.
+
+        Args:
+            ingredient_names (iterable): Ingredients the user has
+            boosts (dict): Ingredient name -> weight
+            exclude_ingredients (iterable, optional): Recipes using any of
+                these are left out
+            limit (int, optional): Keep only the best ``limit`` matches
+            dietary_filters (dict, optional): Dietary flags a recipe must have
+            after (tuple, optional): Keyset ``(score, recipe_id)`` of the last
+                result on the previous page
+
+        Returns:
+            list: ``(recipe_number, match_percentage, score)`` tuples, best first
+        """
+        bonus = np.zeros(len(self.recipe_ids), dtype=np.float64)
+        for name, weight in boosts.items():
+            posting = self.postings.get(name)
+            if posting is not None:
+                bonus[posting] += weight
+
+        numbers, percentages = self._match_percentages(ingredient_names, exclude_ingredients, dietary_filters)
+        scores = percentages * (1 + bonus[numbers])
+        page = self._top(numbers, scores, limit, after)
+        return list(zip(numbers[page].tolist(), percentages[page].tolist(), scores[page].tolist()))
+
+class IngredientIndexHolder:
+    """
+    Builds the index lazily and keeps it fresh without blocking requests
+
+    Only the very first ``get`` builds in the caller's thread. Once the index
+    is older than ``max_age`` seconds, or after ``invalidate``, ``get`` keeps
+    returning the current index while one background thread builds its
+    replacement and swaps it in, then calls ``on_swap`` so results ranked on
+    the old index can be dropped.
+    """
+
+    def __init__(self, collection_getter, max_age=None, on_swap=None):
+        self._collection_getter = collection_getter
+        self.max_age = max_age
+        self.on_swap = on_swap
+        self._index = None
+        self._built_at = 0
+        self._stale = False
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        return not self._stale and (not self.max_age or time.monotonic() - self._built_at < self.max_age)
+
+    def get(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._swap(IngredientIndex.build(self._collection_getter()))
+                return self._index
+
+        if not self._is_fresh():
+            self._rebuild_in_background()
+        return index
+
+    def _swap(self, index):
+        self._index = index
+        self._built_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            # Writes after this point mark the new index stale again
+            self._stale = False
+        threading.Thread(target=self._rebuild, name="ingredient-index-rebuild", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            index = IngredientIndex.build(self._collection_getter())
+            with self._lock:
+                self._swap(index)
+            if self.on_swap:
+                self.on_swap()
+        except Exception as e:
+            self._stale = True
+            print(f"Error rebuilding ingredient index: {e}")
+        finally:
+            self._rebuilding = False
+
+    def invalidate(self):
+        """Rebuild on the next ``get``, serving the current index until the new one is ready"""
+        self._stale = True
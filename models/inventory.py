@@ -1,9 +1,117 @@
+import unicodedata
+from bisect import bisect_right
+from flask import g, has_app_context
 from database.mysql_setup import get_connection
+from database.cache import LRUCache, make_cache
+from database.rows import RowModel
 from datetime import datetime, timedelta
 from config import Config
+from models import units
+from models.expiry import ExpiryQueue, ExpiringItem
 
-class Inventory:
-    def __init__(self, id, user_id, ingredient_name, category, quantity, unit, expiry_date=None, added_date=None):
+# User ID -> (inventory version, ExpiryQueue of their dated inventory rows)
+expiry_queues = LRUCache(max_size=Config.EXPIRY_CACHE_SIZE, ttl=Config.EXPIRY_CACHE_TTL)
+
+# Snapshots and results derived from the inventory, keyed by (user ID, version).
+# Versions live in MySQL and every write bumps them in its own transaction, so
+# no process can read an entry made before another process's write, whichever
+# backend holds the entries; stale ones simply age out
+inventory_cache = make_cache(
+    Config.INVENTORY_CACHE_BACKEND,
+    max_size=Config.INVENTORY_CACHE_SIZE,
+    ttl=Config.INVENTORY_CACHE_TTL,
+    url=Config.INVENTORY_CACHE_URL,
+    prefix='cookbookit:inventory'
+)
+
+def _collation_key(name):
+    # Approximates MySQL's default collation, which ignores case and accents
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+class InventorySnapshot:
+    """
+    A user's whole inventory from one query, indexed for the lookups routes need
+    
+    Built once per request by ``Inventory.snapshot`` and shared by every
+    route and helper that reads the inventory during that request.
+    """
+    
+    __slots__ = ('user_id', 'items', 'by_name', 'names', 'by_expiry', '_expiry_dates', 'base_quantities')
+    
+    def __init__(self, user_id, items):
+        self.user_id = user_id
+        self.items = items
+        
+        # Like update_quantity and deduct_many, the first row of an ingredient wins
+        self.by_name = {}
+        for item in items:
+            self.by_name.setdefault(item.ingredient_name, item)
+        self.names = frozenset(self.by_name)
+        
+        self.by_expiry = sorted((item for item in items if item.expiry_date is not None),
+                                key=lambda item: (item.expiry_date, item.id))
+        self._expiry_dates = [item.expiry_date for item in self.by_expiry]
+        
+        # (ingredient name, base unit) -> total quantity on hand in that base unit
+        self.base_quantities = {}
+        for item in items:
+            base_quantity, base_unit = item.base_quantity, item.base_unit
+            if base_unit is None:
+                base_quantity, base_unit = units.normalize(item.quantity, item.unit, item.ingredient_name)
+            key = (item.ingredient_name, base_unit)
+            self.base_quantities[key] = self.base_quantities.get(key, 0) + base_quantity
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __contains__(self, ingredient_name):
+        return ingredient_name in self.names
+    
+    def get(self, ingredient_name):
+        """The inventory row for an ingredient, or None"""
+        return self.by_name.get(ingredient_name)
+    
+    def expiring(self, days=None, today=None):
+        """
+        Rows expiring within ``days`` (default ``EXPIRATION_WARNING_DAYS``), soonest first
+        
+        Rows already past their date are included, like ``Inventory.get_expiring_items``.
+        """
+        if days is None:
+            days = Config.EXPIRATION_WARNING_DAYS
+        warning_date = (today or datetime.now().date()) + timedelta(days=days)
+        return self.by_expiry[:bisect_right(self._expiry_dates, warning_date)]
+    
+    def base_quantity(self, ingredient_name, base_unit):
+        """Total amount of an ingredient on hand, in ``base_unit``"""
+        return self.base_quantities.get((ingredient_name, base_unit), 0)
+
+class Inventory(RowModel):
+    TABLE = 'inventory'
+    COLUMNS = ('id', 'user_id', 'ingredient_name', 'category', 'quantity', 'unit', 'expiry_date', 'added_date',
+               'base_quantity', 'base_unit')
+    __slots__ = COLUMNS
+    
+    BY_USER_CLAUSE = "WHERE user_id = %s ORDER BY ingredient_name, id"
+    EXPIRING_CLAUSE = "WHERE user_id = %s AND expiry_date IS NOT NULL AND expiry_date <= %s ORDER BY expiry_date"
+    QUANTITY_SQL = "SELECT id, quantity, unit FROM inventory WHERE user_id = %s AND ingredient_name = %s"
+    EXPIRY_QUEUE_SQL = (
+        "SELECT expiry_date, id, ingredient_name FROM inventory WHERE user_id = %s AND expiry_date IS NOT NULL"
+    )
+    VERSION_SQL = "SELECT version FROM inventory_versions WHERE user_id = %s"
+    LOCK_ROWS_SQL = """
+        SELECT id, ingredient_name, quantity, unit FROM inventory 
+        WHERE user_id = %s AND ingredient_name IN ({placeholders})
+        ORDER BY id
+        FOR UPDATE
+        """
+    
+    def __init__(self, id, user_id, ingredient_name, category, quantity, unit, expiry_date=None, added_date=None,
+                 base_quantity=None, base_unit=None):
         self.id = id
         self.user_id = user_id
         self.ingredient_name = ingredient_name
@@ -12,75 +120,156 @@ class Inventory:
         self.unit = unit
         self.expiry_date = expiry_date
         self.added_date = added_date
+        # Quantity in the canonical base unit (g, ml, whole, ...), stored at write time
+        self.base_quantity = base_quantity
+        self.base_unit = base_unit
     
     @staticmethod
     def get_by_user_id(user_id):
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
+        
+        cursor.execute(Inventory.select(Inventory.BY_USER_CLAUSE), (user_id,))
+        inventory_items = Inventory.from_rows(cursor.fetchall())
+        
+        cursor.close()
+        return inventory_items
+    
+    @staticmethod
+    def snapshot(user_id):
+        """
+        Get the user's inventory as an ``InventorySnapshot``
         
+        Inside a request the snapshot is kept on ``flask.g``; across requests
+        it is cached against the user's inventory version. Inventory writes
+        bump the version and drop the request copy, so later reads see them.
+        
+        Args:
+            user_id (int): User ID
+            
+        Returns:
+            InventorySnapshot: The user's inventory
+        """
+        snapshots = g.setdefault('inventory_snapshots', {}) if has_app_context() else {}
+        snapshot = snapshots.get(user_id)
+        if snapshot is not None:
+            return snapshot
+        
+        key = ('snapshot', user_id, Inventory.version(user_id))
+        snapshot = inventory_cache.get(key)
+        if snapshot is None:
+            snapshot = InventorySnapshot(user_id, Inventory.get_by_user_id(user_id))
+            inventory_cache.set(key, snapshot)
+        
+        snapshots[user_id] = snapshot
+        return snapshot
+    
+    @staticmethod
+    def version(user_id):
+        """
+        Get the user's current inventory version
+        
+        Read from the shared ``inventory_versions`` table with one primary key
+        lookup, and kept on ``flask.g`` for the rest of the request. Users who
+        never changed their inventory are at version 0.
+        """
+        versions = g.setdefault('inventory_versions', {}) if has_app_context() else {}
+        version = versions.get(user_id)
+        if version is None:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(Inventory.VERSION_SQL, (user_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            version = versions[user_id] = row[0] if row else 0
+        return version
+    
+    @staticmethod
+    def _bump_version(cursor, user_id):
+        """
+        Bump the user's inventory version inside the caller's transaction
+        
+        Returns:
+            int: The new version, as seen by this transaction
+        """
         cursor.execute(
-            "SELECT * FROM inventory WHERE user_id = %s ORDER BY ingredient_name",
+            """
+            INSERT INTO inventory_versions (user_id, version) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+            """,
             (user_id,)
         )
+        cursor.execute(Inventory.VERSION_SQL, (user_id,))
+        return cursor.fetchone()[0]
+    
+    @staticmethod
+    def invalidate(user_id):
+        """
+        Drop the request's copies of the user's inventory and version
         
-        inventory_items = []
-        for item in cursor.fetchall():
-            inventory_items.append(Inventory(
-                id=item['id'],
-                user_id=item['user_id'],
-                ingredient_name=item['ingredient_name'],
-                category=item['category'],
-                quantity=item['quantity'],
-                unit=item['unit'],
-                expiry_date=item['expiry_date'],
-                added_date=item['added_date']
-            ))
+        Call after a write that bumped the version has committed, so later
+        reads in the same request see it.
+        """
+        if has_app_context():
+            g.get('inventory_snapshots', {}).pop(user_id, None)
+            g.get('inventory_versions', {}).pop(user_id, None)
+    
+    @staticmethod
+    def memoize(user_id, key, compute):
+        """
+        Cache a result derived from the user's inventory until it next changes
         
-        cursor.close()
-        return inventory_items
+        Args:
+            user_id (int): User ID
+            key (tuple): Identifies the result, e.g. a query and its arguments
+            compute (callable): Builds the result on a cache miss
+            
+        Returns:
+            The cached or freshly computed result
+        """
+        cache_key = ('memo', user_id, Inventory.version(user_id), *key)
+        result = inventory_cache.get(cache_key)
+        if result is None:
+            result = compute()
+            inventory_cache.set(cache_key, result)
+        return result
     
     @staticmethod
     def get_by_id(item_id):
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM inventory WHERE id = %s", (item_id,))
-        item = cursor.fetchone()
+        cursor.execute(Inventory.select("WHERE id = %s"), (item_id,))
+        item = Inventory.from_row(cursor.fetchone())
         cursor.close()
         
-        if not item:
-            return None
-        
-        return Inventory(
-            id=item['id'],
-            user_id=item['user_id'],
-            ingredient_name=item['ingredient_name'],
-            category=item['category'],
-            quantity=item['quantity'],
-            unit=item['unit'],
-            expiry_date=item['expiry_date'],
-            added_date=item['added_date']
-        )
+        return item
     
     @staticmethod
     def add_item(user_id, ingredient_name, category, quantity, unit, expiry_date=None):
         conn = get_connection()
         cursor = conn.cursor()
+        base_quantity, base_unit = units.normalize(quantity, unit, ingredient_name)
         
         try:
             cursor.execute(
                 """
                 INSERT INTO inventory 
-                (user_id, ingredient_name, category, quantity, unit, expiry_date) 
-                VALUES (%s, %s, %s, %s, %s, %s)
+                (user_id, ingredient_name, category, quantity, unit, expiry_date, base_quantity, base_unit) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 """,
-                (user_id, ingredient_name, category, quantity, unit, expiry_date)
+                (user_id, ingredient_name, category, quantity, unit, expiry_date, base_quantity, base_unit)
             )
-            conn.commit()
             item_id = cursor.lastrowid
+            version = Inventory._bump_version(cursor, user_id)
+            conn.commit()
             cursor.close()
             
-            return Inventory.get_by_id(item_id)
+            Inventory.invalidate(user_id)
+            item = Inventory.get_by_id(item_id)
+            if item:
+                Inventory._track_expiry(item, version)
+            return item
         except Exception as e:
             conn.rollback()
             cursor.close()
@@ -91,20 +280,29 @@ class Inventory:
     def update_item(item_id, ingredient_name, category, quantity, unit, expiry_date=None):
         conn = get_connection()
         cursor = conn.cursor()
+        base_quantity, base_unit = units.normalize(quantity, unit, ingredient_name)
         
         try:
             cursor.execute(
                 """
                 UPDATE inventory 
-                SET ingredient_name = %s, category = %s, quantity = %s, unit = %s, expiry_date = %s
+                SET ingredient_name = %s, category = %s, quantity = %s, unit = %s, expiry_date = %s,
+                    base_quantity = %s, base_unit = %s
                 WHERE id = %s
                 """,
-                (ingredient_name, category, quantity, unit, expiry_date, item_id)
+                (ingredient_name, category, quantity, unit, expiry_date, base_quantity, base_unit, item_id)
             )
+            cursor.execute("SELECT user_id FROM inventory WHERE id = %s", (item_id,))
+            owner = cursor.fetchone()
+            version = Inventory._bump_version(cursor, owner[0]) if owner else None
             conn.commit()
             cursor.close()
             
-            return Inventory.get_by_id(item_id)
+            item = Inventory.get_by_id(item_id)
+            if item:
+                Inventory.invalidate(item.user_id)
+                Inventory._track_expiry(item, version)
+            return item
         except Exception as e:
             conn.rollback()
             cursor.close()
@@ -117,9 +315,17 @@ class Inventory:
         cursor = conn.cursor()
         
         try:
+            cursor.execute("SELECT user_id FROM inventory WHERE id = %s", (item_id,))
+            owner = cursor.fetchone()
+            
             cursor.execute("DELETE FROM inventory WHERE id = %s", (item_id,))
+            version = Inventory._bump_version(cursor, owner[0]) if owner else None
             conn.commit()
             cursor.close()
+            
+            if owner:
+                Inventory.invalidate(owner[0])
+                Inventory._untrack_expiry(owner[0], [item_id], version)
             return True
         except Exception as e:
             conn.rollback()
@@ -130,35 +336,73 @@ class Inventory:
     @staticmethod
     def get_expiring_items(user_id):
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         
         warning_date = datetime.now().date() + timedelta(days=Config.EXPIRATION_WARNING_DAYS)
         
-        cursor.execute(
-            """
-            SELECT * FROM inventory 
-            WHERE user_id = %s AND expiry_date IS NOT NULL AND expiry_date <= %s
-            ORDER BY expiry_date
-            """,
-            (user_id, warning_date)
-        )
-        
-        expiring_items = []
-        for item in cursor.fetchall():
-            expiring_items.append(Inventory(
-                id=item['id'],
-                user_id=item['user_id'],
-                ingredient_name=item['ingredient_name'],
-                category=item['category'],
-                quantity=item['quantity'],
-                unit=item['unit'],
-                expiry_date=item['expiry_date'],
-                added_date=item['added_date']
-            ))
+        cursor.execute(Inventory.select(Inventory.EXPIRING_CLAUSE), (user_id, warning_date))
+        expiring_items = Inventory.from_rows(cursor.fetchall())
         
         cursor.close()
         return expiring_items
     
+    @staticmethod
+    def expiry_queue(user_id):
+        """
+        Get the user's dated inventory rows sorted by expiry date
+        
+        Loaded with one indexed query and then kept current in place by this
+        process's inventory writes, so rankings never rescan the table. A
+        queue older than the user's shared inventory version (another
+        process wrote in between) is loaded again.
+        
+        Args:
+            user_id (int): User ID
+            
+        Returns:
+            ExpiryQueue: The user's queue
+        """
+        version = Inventory.version(user_id)
+        cached = expiry_queues.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(Inventory.EXPIRY_QUEUE_SQL, (user_id,))
+        queue = ExpiryQueue(ExpiringItem(*row) for row in cursor.fetchall())
+        cursor.close()
+        
+        expiry_queues.set(user_id, (version, queue))
+        return queue
+    
+    @staticmethod
+    def _current_queue(user_id, version):
+        # The queue may only absorb a write if it reflects everything before it;
+        # otherwise it is dropped and loads fresh when next needed
+        cached = expiry_queues.get(user_id)
+        if cached is None:
+            return None
+        if version is None or cached[0] != version - 1:
+            expiry_queues.pop(user_id)
+            return None
+        expiry_queues.set(user_id, (version, cached[1]))
+        return cached[1]
+    
+    @staticmethod
+    def _track_expiry(item, version):
+        # Only queues already in memory are updated; others load fresh when needed
+        queue = Inventory._current_queue(item.user_id, version)
+        if queue is not None:
+            queue.upsert(item.id, item.ingredient_name, item.expiry_date)
+    
+    @staticmethod
+    def _untrack_expiry(user_id, item_ids, version):
+        queue = Inventory._current_queue(user_id, version)
+        if queue is not None:
+            queue.remove(item_ids)
+    
     @staticmethod
     def update_quantity(user_id, ingredient_name, quantity_change):
         conn = get_connection()
@@ -166,28 +410,35 @@ class Inventory:
         
         try:
             # First check if the ingredient exists for this user
-            cursor.execute(
-                "SELECT id, quantity FROM inventory WHERE user_id = %s AND ingredient_name = %s",
-                (user_id, ingredient_name)
-            )
+            cursor.execute(Inventory.QUANTITY_SQL, (user_id, ingredient_name))
             
             item = cursor.fetchone()
             
             if item:
-                item_id, current_quantity = item
+                item_id, current_quantity, unit = item
                 new_quantity = current_quantity + quantity_change
                 
                 # If new quantity is 0 or less, delete the item
-                if new_quantity <= 0:
+                deleted = new_quantity <= 0
+                if deleted:
                     cursor.execute("DELETE FROM inventory WHERE id = %s", (item_id,))
                 else:
+                    base_quantity, _ = units.normalize(new_quantity, unit, ingredient_name)
                     cursor.execute(
-                        "UPDATE inventory SET quantity = %s WHERE id = %s",
-                        (new_quantity, item_id)
+                        "UPDATE inventory SET quantity = %s, base_quantity = %s WHERE id = %s",
+                        (new_quantity, base_quantity, item_id)
                     )
                 
+                version = Inventory._bump_version(cursor, user_id)
                 conn.commit()
                 cursor.close()
+                Inventory.invalidate(user_id)
+                
+                # Only once committed, so a failed write leaves the queue intact
+                if deleted:
+                    Inventory._untrack_expiry(user_id, [item_id], version)
+                else:
+                    Inventory._current_queue(user_id, version)
                 return True
             else:
                 cursor.close()
@@ -196,4 +447,84 @@ class Inventory:
             conn.rollback()
             cursor.close()
             print(f"Error updating inventory quantity: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    def deduct_many(cursor, user_id, amounts):
+        """
+        Subtract several ingredient amounts inside the caller's transaction
+        
+        Matching rows are locked with one ``SELECT ... FOR UPDATE``, every new
+        quantity is written with a single ``CASE`` update, and depleted rows
+        are removed with a single delete, and the user's inventory version is
+        bumped when anything changed. Nothing is committed here; call
+        ``Inventory.invalidate`` once the transaction has committed. Cached
+        expiry queues then reload at the new version.
+        
+        Args:
+            cursor: Cursor on the connection holding the transaction
+            user_id (int): User ID
+            amounts (dict): Ingredient name -> ingredient dict with ``amount``,
+                ``unit`` and optionally ``base_amount``/``base_unit``
+            
+        Returns:
+            int: Number of inventory rows changed or removed
+        """
+        if not amounts:
+            return 0
+        
+        names = list(amounts)
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(Inventory.LOCK_ROWS_SQL.format(placeholders=placeholders), (user_id, *names))
+        
+        # The IN match follows the column's collation, so rows can come back
+        # spelled differently from the recipe ("Jalapeno" for "jalapeño")
+        by_key = {}
+        for name in names:
+            by_key.setdefault(_collation_key(name), name)
+        
+        updates = []
+        depleted = []
+        seen = set()
+        for item_id, ingredient_name, quantity, unit in cursor.fetchall():
+            name = ingredient_name if ingredient_name in amounts else by_key.get(_collation_key(ingredient_name))
+            # Like update_quantity, only the first row of an ingredient is used
+            if name is None or name in seen:
+                continue
+            seen.add(name)
+            
+            used = amounts[name]
+            base_unit, factor = units.conversion(unit, ingredient_name)
+            if used.get('base_unit') == base_unit:
+                new_quantity = quantity - used['base_amount'] / factor
+            else:
+                # Units can't be converted into each other, subtract the raw amount
+                new_quantity = quantity - used['amount']
+            
+            if new_quantity <= 0:
+                depleted.append(item_id)
+            else:
+                updates.append((item_id, new_quantity, new_quantity * factor))
+        
+        if updates:
+            cases = " ".join(["WHEN %s THEN %s"] * len(updates))
+            id_placeholders = ", ".join(["%s"] * len(updates))
+            params = [value for item_id, quantity, _ in updates for value in (item_id, quantity)]
+            params.extend(value for item_id, _, base_quantity in updates for value in (item_id, base_quantity))
+            params.extend(item_id for item_id, _, _ in updates)
+            cursor.execute(
+                f"""
+                UPDATE inventory
+                SET quantity = CASE id {cases} END, base_quantity = CASE id {cases} END
+                WHERE id IN ({id_placeholders})
+                """,
+                tuple(params)
+            )
+        
+        if depleted:
+            id_placeholders = ", ".join(["%s"] * len(depleted))
+            cursor.execute(f"DELETE FROM inventory WHERE id IN ({id_placeholders})", tuple(depleted))
+        
+        if updates or depleted:
+            Inventory._bump_version(cursor, user_id)
+        return len(updates) + len(depleted)
\ No newline at end of file
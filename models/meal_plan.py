@@ -1,7 +1,40 @@
 from database.mysql_setup import get_connection
+from database.rows import RowModel
 from models.recipe import Recipe
+from models.grocery import aggregate_ingredients
+from models import units
 
-class MealPlan:
+class MealPlan(RowModel):
+    TABLE = 'meal_plans'
+    COLUMNS = ('id', 'user_id', 'week_start_date', 'created_at')
+    __slots__ = COLUMNS + ('items',)
+    
+    WEEK_CLAUSE = "WHERE user_id = %s AND week_start_date = %s"
+    RANGE_CLAUSE = "WHERE user_id = %s AND week_start_date BETWEEN %s AND %s ORDER BY week_start_date"
+    ITEMS_SQL = """
+        SELECT id, meal_plan_id, recipe_id, day_of_week, meal_type FROM meal_plan_items 
+        WHERE meal_plan_id IN ({placeholders}) ORDER BY id
+        """
+    GROCERY_SQL = """
+        SELECT g.ingredient_name, g.unit,
+            g.needed - COALESCE(SUM(CASE WHEN i.base_unit = g.base_unit THEN i.base_quantity END), 0) AS shortfall,
+            GROUP_CONCAT(
+                CASE WHEN i.base_unit <> g.base_unit THEN CONCAT(ROUND(i.quantity, 2), ' ', i.unit) END
+                ORDER BY i.id SEPARATOR ', '
+            ) AS in_stock
+        FROM (
+            SELECT ingredient_name, base_unit, MIN(unit) AS unit, SUM(amount) AS needed
+            FROM meal_plan_grocery
+            WHERE meal_plan_id IN ({placeholders})
+            GROUP BY ingredient_name, base_unit
+        ) g
+        LEFT JOIN inventory i 
+            ON i.user_id = %s AND i.ingredient_name = g.ingredient_name
+        GROUP BY g.ingredient_name, g.base_unit, g.unit, g.needed
+        HAVING shortfall > 1e-9
+        ORDER BY g.ingredient_name
+        """
+    
     def __init__(self, id, user_id, week_start_date, created_at=None):
         self.id = id
         self.user_id = user_id
@@ -12,47 +45,44 @@ class MealPlan:
     @staticmethod
     def get_by_user(user_id, week_start_date=None):
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         
         if week_start_date:
-            cursor.execute(
-                "SELECT * FROM meal_plans WHERE user_id = %s AND week_start_date = %s",
-                (user_id, week_start_date)
-            )
+            cursor.execute(MealPlan.select(MealPlan.WEEK_CLAUSE), (user_id, week_start_date))
         else:
             cursor.execute(
-                "SELECT * FROM meal_plans WHERE user_id = %s ORDER BY week_start_date DESC",
+                MealPlan.select("WHERE user_id = %s ORDER BY week_start_date DESC"),
                 (user_id,)
             )
         
-        meal_plans = []
-        for plan_data in cursor.fetchall():
-            plan = MealPlan(
-                id=plan_data['id'],
-                user_id=plan_data['user_id'],
-                week_start_date=plan_data['week_start_date'],
-                created_at=plan_data['created_at']
-            )
-            
-            # Get meal plan items
-            cursor.execute(
-                "SELECT * FROM meal_plan_items WHERE meal_plan_id = %s",
-                (plan.id,)
-            )
-            
-            for item_data in cursor.fetchall():
-                # Get recipe details
-                recipe = Recipe.get_by_id(item_data['recipe_id'])
-                
-                if recipe:
-                    plan.items.append({
-                        'id': item_data['id'],
-                        'day_of_week': item_data['day_of_week'],
-                        'meal_type': item_data['meal_type'],
-                        'recipe': recipe
-                    })
+        meal_plans = MealPlan.from_rows(cursor.fetchall())
+        
+        MealPlan._load_items(cursor, meal_plans)
+        
+        cursor.close()
+        return meal_plans
+    
+    @staticmethod
+    def get_by_user_range(user_id, start_date, end_date):
+        """
+        Get a user's meal plans for every week starting between two dates
+        
+        Args:
+            user_id (int): User ID
+            start_date (date): Earliest week start date, inclusive
+            end_date (date): Latest week start date, inclusive
             
-            meal_plans.append(plan)
+        Returns:
+            list: Hydrated MealPlan objects, earliest week first
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(MealPlan.select(MealPlan.RANGE_CLAUSE), (user_id, start_date, end_date))
+        
+        meal_plans = MealPlan.from_rows(cursor.fetchall())
+        
+        MealPlan._load_items(cursor, meal_plans)
         
         cursor.close()
         return meal_plans
@@ -60,42 +90,50 @@ class MealPlan:
     @staticmethod
     def get_by_id(plan_id):
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM meal_plans WHERE id = %s", (plan_id,))
-        plan_data = cursor.fetchone()
+        cursor.execute(MealPlan.select("WHERE id = %s"), (plan_id,))
+        plan = MealPlan.from_row(cursor.fetchone())
         
-        if not plan_data:
+        if not plan:
             cursor.close()
             return None
         
-        plan = MealPlan(
-            id=plan_data['id'],
-            user_id=plan_data['user_id'],
-            week_start_date=plan_data['week_start_date'],
-            created_at=plan_data['created_at']
-        )
+        MealPlan._load_items(cursor, [plan])
         
-        # Get meal plan items
-        cursor.execute(
-            "SELECT * FROM meal_plan_items WHERE meal_plan_id = %s",
-            (plan.id,)
-        )
+        cursor.close()
+        return plan
+    
+    @staticmethod
+    def _load_items(cursor, plans):
+        """
+        Attach items to the given plans using one MySQL query and one Mongo query
+        
+        Args:
+            cursor: Cursor to run the item query on
+            plans (list): MealPlan objects to populate
+        """
+        if not plans:
+            return
+        
+        plans_by_id = {plan.id: plan for plan in plans}
+        placeholders = ", ".join(["%s"] * len(plans_by_id))
+        cursor.execute(MealPlan.ITEMS_SQL.format(placeholders=placeholders), tuple(plans_by_id))
+        item_rows = cursor.fetchall()
+        
+        # Resolve every recipe referenced by these plans in one round-trip
+        recipes = Recipe.get_many(recipe_id for _, _, recipe_id, _, _ in item_rows)
         
-        for item_data in cursor.fetchall():
-            # Get recipe details
-            recipe = Recipe.get_by_id(item_data['recipe_id'])
+        for item_id, meal_plan_id, recipe_id, day_of_week, meal_type in item_rows:
+            recipe = recipes.get(recipe_id)
             
             if recipe:
-                plan.items.append({
-                    'id': item_data['id'],
-                    'day_of_week': item_data['day_of_week'],
-                    'meal_type': item_data['meal_type'],
+                plans_by_id[meal_plan_id].items.append({
+                    'id': item_id,
+                    'day_of_week': day_of_week,
+                    'meal_type': meal_type,
                     'recipe': recipe
                 })
-        
-        cursor.close()
-        return plan
     
     @staticmethod
     def create(user_id, week_start_date):
@@ -132,6 +170,11 @@ class MealPlan:
                 """,
                 (plan_id, recipe_id, day_of_week, meal_type)
             )
+            
+            recipe = Recipe.get_by_id(recipe_id)
+            if recipe:
+                MealPlan._apply_grocery_deltas(cursor, plan_id, aggregate_ingredients([recipe]))
+            
             conn.commit()
             cursor.close()
             
@@ -150,7 +193,7 @@ class MealPlan:
         try:
             # Get meal plan id first
             cursor.execute(
-                "SELECT meal_plan_id FROM meal_plan_items WHERE id = %s",
+                "SELECT meal_plan_id, recipe_id FROM meal_plan_items WHERE id = %s",
                 (item_id,)
             )
             result = cursor.fetchone()
@@ -158,10 +201,15 @@ class MealPlan:
                 cursor.close()
                 return None
             
-            plan_id = result[0]
+            plan_id, recipe_id = result
             
             # Delete the item
             cursor.execute("DELETE FROM meal_plan_items WHERE id = %s", (item_id,))
+            
+            recipe = Recipe.get_by_id(recipe_id)
+            if recipe:
+                MealPlan._apply_grocery_deltas(cursor, plan_id, aggregate_ingredients([recipe]), sign=-1)
+            
             conn.commit()
             cursor.close()
             
@@ -170,4 +218,184 @@ class MealPlan:
             conn.rollback()
             cursor.close()
             print(f"Error removing meal plan item: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    @staticmethod
+    def replace_items(plan_id, items):
+        """
+        Replace every item of a meal plan in one transaction
+        
+        The old items are deleted, the new ones bulk-inserted and the plan's
+        grocery totals recomputed before a single commit; the plan is then
+        hydrated once.
+        
+        Args:
+            plan_id (int): Meal plan ID
+            items (list): ``(recipe_id, day_of_week, meal_type)`` tuples;
+                an empty list clears the plan
+            
+        Returns:
+            MealPlan: The updated plan, or None on error
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("DELETE FROM meal_plan_items WHERE meal_plan_id = %s", (plan_id,))
+            cursor.execute("DELETE FROM meal_plan_grocery WHERE meal_plan_id = %s", (plan_id,))
+            
+            if items:
+                cursor.executemany(
+                    """
+                    INSERT INTO meal_plan_items 
+                    (meal_plan_id, recipe_id, day_of_week, meal_type) 
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    [(plan_id, recipe_id, day_of_week, meal_type) for recipe_id, day_of_week, meal_type in items]
+                )
+                
+                recipes = Recipe.get_many(recipe_id for recipe_id, _, _ in items)
+                totals = aggregate_ingredients(
+                    recipes[recipe_id] for recipe_id, _, _ in items if recipe_id in recipes
+                )
+                MealPlan._apply_grocery_deltas(cursor, plan_id, totals)
+            
+            conn.commit()
+            cursor.close()
+            
+            return MealPlan.get_by_id(plan_id)
+        except Exception as e:
+            conn.rollback()
+            cursor.close()
+            print(f"Error replacing meal plan items: {e}")
+            return None
+    
+    @staticmethod
+    def _apply_grocery_deltas(cursor, plan_id, totals, sign=1):
+        """
+        Add (or with ``sign=-1`` subtract) ingredient totals to a plan's grocery rows
+        
+        Runs on the caller's cursor and does not commit, so the deltas land in
+        the same transaction as the item change that caused them.
+        
+        Args:
+            cursor: Cursor to run the statements on
+            plan_id (int): Meal plan ID
+            totals (list): ``(name, base_unit, unit, base_amount)`` tuples from
+                ``aggregate_ingredients``
+            sign (int): 1 when items were added, -1 when they were removed
+        """
+        if not totals:
+            return
+        
+        cursor.executemany(
+            """
+            INSERT INTO meal_plan_grocery 
+            (meal_plan_id, ingredient_name, base_unit, unit, amount) 
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount)
+            """,
+            [(plan_id, name, base_unit, unit, sign * amount) for name, base_unit, unit, amount in totals]
+        )
+        
+        if sign < 0:
+            # Drop ingredients no remaining item needs, allowing for float drift
+            cursor.execute(
+                "DELETE FROM meal_plan_grocery WHERE meal_plan_id = %s AND amount <= 1e-9",
+                (plan_id,)
+            )
+    
+    @staticmethod
+    def rebuild_grocery(cursor, plan_id):
+        """
+        Recompute a plan's grocery rows from its items
+        
+        Used by the migration that backfilled existing plans, and when a
+        recipe in the plan has its ingredients edited. Does not commit.
+        
+        Args:
+            cursor: Cursor to run the statements on
+            plan_id (int): Meal plan ID
+        """
+        cursor.execute("DELETE FROM meal_plan_grocery WHERE meal_plan_id = %s", (plan_id,))
+        cursor.execute("SELECT recipe_id FROM meal_plan_items WHERE meal_plan_id = %s", (plan_id,))
+        recipe_ids = [row[0] for row in cursor.fetchall()]
+        
+        recipes = Recipe.get_many(recipe_ids)
+        totals = aggregate_ingredients(recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes)
+        MealPlan._apply_grocery_deltas(cursor, plan_id, totals)
+    
+    @staticmethod
+    def refresh_grocery_for_recipe(recipe_id):
+        """
+        Rebuild the grocery rows of every plan that uses a recipe
+        
+        Call after the recipe's ingredients change, since the rows store the
+        totals of the ingredients at the time each item was added. Edits made
+        directly in Mongo, outside ``Recipe.update``, are not picked up.
+        
+        Args:
+            recipe_id (str): Recipe ID
+            
+        Returns:
+            bool: True if successful
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT DISTINCT meal_plan_id FROM meal_plan_items WHERE recipe_id = %s", (str(recipe_id),))
+            for (plan_id,) in cursor.fetchall():
+                MealPlan.rebuild_grocery(cursor, plan_id)
+            
+            conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            conn.rollback()
+            cursor.close()
+            print(f"Error refreshing grocery totals: {e}")
+            return False
+    
+    @staticmethod
+    def get_grocery_list(user_id, plan_ids):
+        """
+        Read what to buy for one or more meal plans
+        
+        The per-plan totals are kept up to date as items change, so this is a
+        single indexed query. Inventory is joined in at read time, which keeps
+        the totals valid across inventory changes without rewriting them.
+        
+        Stock is matched by ingredient name. Only stock whose unit converts to
+        the planned one is subtracted; stock in another unit (cups of flour
+        against grams) can't be compared, so it is listed alongside instead.
+        
+        Args:
+            user_id (int): User whose inventory is subtracted
+            plan_ids (list): Meal plan IDs to shop for
+            
+        Returns:
+            list: Dicts with ``name``, ``amount`` and ``unit`` for every shortfall,
+            plus ``in_stock`` describing stock in other units (or None), sorted
+            by ingredient name
+        """
+        if not plan_ids:
+            return []
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ", ".join(["%s"] * len(plan_ids))
+        cursor.execute(MealPlan.GROCERY_SQL.format(placeholders=placeholders), (*plan_ids, user_id))
+        rows = cursor.fetchall()
+        cursor.close()
+        
+        return [
+            {
+                'name': name,
+                'amount': round(units.from_base(shortfall, unit, name), 2),
+                'unit': unit,
+                'in_stock': in_stock
+            }
+            for name, unit, shortfall, in_stock in rows
+        ]
@@ -0,0 +1,243 @@
+import random
+import time
+from collections import Counter
+
+from models.expiry import expiry_weights
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner')
+
+# Relative weight of each term of the plan score
+DEFAULT_WEIGHTS = {
+    'coverage': 1.0,     # share of a recipe's ingredients already in the inventory
+    'expiring': 1.5,     # expiring ingredients the week uses, soonest first
+    'tag': 1.0,          # recipe tagged for the slot's meal type
+    'nutrition': 0.5,    # distance of each day's totals from the daily targets
+    'variety': 0.4       # penalty for every extra repeat of a recipe
+}
+
+# Daily nutrition targets compared against the sum of a day's recipes
+DEFAULT_NUTRITION_TARGETS = {
+    'calories': 2000,
+    'protein': 60
+}
+
+class WeeklyPlanner:
+    """
+    Fill every (day, meal type) slot of a week with a recipe
+
+    Each candidate's per-slot score (inventory coverage and tag fit) is
+    computed once. The week-level terms are tracked incrementally, so trying
+    a recipe in a slot costs a handful of dictionary operations:
+    - expiring ingredients count once per week
+    - daily nutrition totals
+    - repeats
+
+    A greedy pass fills the slots and then random single-slot moves improve
+    the plan until the deadline passes or a full pass finds nothing better.
+    """
+
+    def __init__(self, recipes, inventory_names, expiring_items=None, meal_types=MEAL_TYPES, days=7,
+                 weights=None, nutrition_targets=None, seed=None):
+        """
+        Args:
+            recipes (list): Full recipe documents to choose from
+            inventory_names (iterable): Ingredient names the user has
+            expiring_items (list, optional): Inventory rows about to expire
+            meal_types (tuple): Meal types to plan each day
+            days (int): Number of days to plan
+            weights (dict, optional): Overrides for ``DEFAULT_WEIGHTS``
+            nutrition_targets (dict, optional): Overrides for ``DEFAULT_NUTRITION_TARGETS``
+            seed (int, optional): Seed for the local search, for repeatable plans
+        """
+        self.recipes = recipes
+        self.meal_types = tuple(meal_types)
+        self.slots = [(day, meal_type) for day in range(days) for meal_type in self.meal_types]
+        self.days = days
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.targets = {**DEFAULT_NUTRITION_TARGETS, **(nutrition_targets or {})}
+        self.random = random.Random(seed)
+
+        inventory_names = set(inventory_names)
+        weights_by_name = expiry_weights(expiring_items or [])
+
+        # Per meal type: candidate -> slot score
+        self.slot_scores = {meal_type: [] for meal_type in self.meal_types}
+        # Candidate -> expiring ingredient names it uses
+        self.expiring_used = []
+        # Candidate -> (nutrient, amount) pairs
+        self.nutrients = []
+
+        for recipe in recipes:
+            names = {ingredient.get('name') for ingredient in recipe.get('ingredients', [])}
+            coverage = len(names & inventory_names) / len(names) if names else 0
+
+            tags = {tag.lower() for tag in recipe.get('tags', [])}
+            tagged_meals = tags.intersection(self.meal_types)
+            for meal_type in self.meal_types:
+                if meal_type in tags:
+                    tag_fit = 1
+                elif tagged_meals:
+                    tag_fit = -1  # Tagged for a different meal
+                else:
+                    tag_fit = 0
+                self.slot_scores[meal_type].append(
+                    self.weights['coverage'] * coverage + self.weights['tag'] * tag_fit
+                )
+
+            self.expiring_used.append(frozenset(name for name in names if name in weights_by_name))
+
+            nutrition = recipe.get('nutrition') or {}
+            self.nutrients.append(tuple(
+                # Recipes without the figure count as an even share of the target
+                (nutrient, nutrition.get(nutrient, target / len(self.meal_types)))
+                for nutrient, target in self.targets.items()
+            ))
+
+        self.expiry_weights = weights_by_name
+
+    def plan(self, time_budget_ms=50, deadline=None):
+        """
+        Build the week's plan
+
+        The greedy pass always completes; local search only runs while time
+        is left, so a caller that spent its budget elsewhere still gets the
+        greedy plan.
+
+        Args:
+            time_budget_ms (float): Wall-clock budget for greedy plus local search
+            deadline (float, optional): ``time.perf_counter()`` value to stop
+                searching at, overriding ``time_budget_ms``
+
+        Returns:
+            list: ``(recipe, day_of_week, meal_type)`` tuples, one per slot; empty
+            if there are no candidates
+        """
+        if not self.recipes:
+            return []
+
+        if deadline is None:
+            deadline = time.perf_counter() + time_budget_ms / 1000
+        self._reset()
+
+        # Greedy: give each slot the best recipe given the slots already filled
+        for slot in range(len(self.slots)):
+            best = max(range(len(self.recipes)), key=lambda candidate: self._delta(slot, candidate))
+            self._assign(slot, best)
+
+        # Local search: try every candidate in a random slot, keep improving moves
+        slots = list(range(len(self.slots)))
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            self.random.shuffle(slots)
+            for slot in slots:
+                if time.perf_counter() >= deadline:
+                    break
+
+                current = self.assignment[slot]
+                best, best_delta = current, 1e-9
+                for candidate in range(len(self.recipes)):
+                    if candidate != current:
+                        delta = self._delta(slot, candidate)
+                        if delta > best_delta:
+                            best, best_delta = candidate, delta
+
+                if best != current:
+                    self._assign(slot, best)
+                    improved = True
+
+        return [
+            (self.recipes[candidate], day, meal_type)
+            for candidate, (day, meal_type) in zip(self.assignment, self.slots)
+        ]
+
+    def _reset(self):
+        self.assignment = [None] * len(self.slots)
+        self.use_counts = Counter()
+        self.expiring_counts = Counter()
+        self.day_totals = [dict.fromkeys(self.targets, 0.0) for _ in range(self.days)]
+
+    def _nutrition_penalty(self, totals):
+        return sum(abs(totals[nutrient] - target) / target for nutrient, target in self.targets.items() if target)
+
+    def _delta(self, slot, candidate):
+        """Change in plan score if ``candidate`` took ``slot``"""
+        current = self.assignment[slot]
+        if candidate == current:
+            return 0.0
+
+        day, meal_type = self.slots[slot]
+        weights = self.weights
+        scores = self.slot_scores[meal_type]
+
+        delta = scores[candidate]
+        if current is not None:
+            delta -= scores[current]
+
+        # Repeats cost c * (c - 1) / 2, so each extra use costs more than the last
+        delta -= weights['variety'] * self.use_counts[candidate]
+        if current is not None:
+            delta += weights['variety'] * (self.use_counts[current] - 1)
+
+        # Expiring ingredients only score the first time the week uses them
+        counts = self.expiring_counts
+        added = self.expiring_used[candidate]
+        for name in added:
+            if counts[name] == 0:
+                delta += weights['expiring'] * self.expiry_weights[name]
+        if current is not None:
+            for name in self.expiring_used[current]:
+                if counts[name] == 1 and name not in added:
+                    delta -= weights['expiring'] * self.expiry_weights[name]
+
+        # Daily nutrition totals
+        totals = self.day_totals[day]
+        new_totals = dict(totals)
+        if current is not None:
+            for nutrient, amount in self.nutrients[current]:
+                new_totals[nutrient] -= amount
+        for nutrient, amount in self.nutrients[candidate]:
+            new_totals[nutrient] += amount
+        delta -= weights['nutrition'] * (self._nutrition_penalty(new_totals) - self._nutrition_penalty(totals))
+
+        return delta
+
+    def _assign(self, slot, candidate):
+        current = self.assignment[slot]
+        day, _ = self.slots[slot]
+        totals = self.day_totals[day]
+
+        if current is not None:
+            self.use_counts[current] -= 1
+            self.expiring_counts.subtract(self.expiring_used[current])
+            for nutrient, amount in self.nutrients[current]:
+                totals[nutrient] -= amount
+
+        self.assignment[slot] = candidate
+        self.use_counts[candidate] += 1
+        self.expiring_counts.update(self.expiring_used[candidate])
+        for nutrient, amount in self.nutrients[candidate]:
+            totals[nutrient] += amount
+
+def plan_week(recipes, inventory_names, expiring_items=None, time_budget_ms=50, seed=None, deadline=None):
+    """
+    Plan breakfast, lunch and dinner for a week
+
+    Args:
+        recipes (list): Full recipe documents to choose from
+        inventory_names (iterable): Ingredient names the user has
+        expiring_items (list, optional): Inventory rows about to expire
+        time_budget_ms (float): Wall-clock budget for the search
+        seed (int, optional): Seed for repeatable plans
+        deadline (float, optional): ``time.perf_counter()`` value to stop
+            searching at, e.g. derived from when the request started
+
+    Returns:
+        list: ``(recipe_id, day_of_week, meal_type)`` tuples ready for
+        ``MealPlan.replace_items``
+    """
+    planner = WeeklyPlanner(recipes, inventory_names, expiring_items, seed=seed)
+    return [
+        (str(recipe['_id']), day, meal_type)
+        for recipe, day, meal_type in planner.plan(time_budget_ms, deadline)
+    ]
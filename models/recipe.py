@@ -1,112 +1,355 @@
-from database.mongo_setup import mongo_db
+import uuid
+from database.mongo_setup import get_db
+from database.cache import LRUCache, watch_collection
+from models.ingredient_index import IngredientIndexHolder, DIETARY_KEYS
+from models import units
 from bson.objectid import ObjectId
+from config import Config
 
-print(f"Mongo DB connected: {mongo_db is not None}")
+# Recipe documents keyed by ObjectId, and query results keyed by query
+recipe_cache = LRUCache(max_size=Config.RECIPE_CACHE_SIZE, ttl=Config.RECIPE_CACHE_TTL)
+recipe_query_cache = LRUCache(max_size=Config.RECIPE_QUERY_CACHE_SIZE, ttl=Config.RECIPE_CACHE_TTL)
+
+# Fields the recipe card templates need; projections keep the rest off the wire
+RECIPE_CARD_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "prep_time": 1,
+    "cook_time": 1,
+    "difficulty": 1,
+    "tags": 1,
+    "image_url": 1,
+    "dietary_info": 1,
+    "match_percentage": 1,
+    "use_up_score": 1
+}
+
+# Part of every key memoized against a user's inventory, so those results are
+# not reused once the catalog changes. A random token rather than a counter, as
+# processes sharing a cache backend each pick up changes on their own
+_catalog = {"generation": uuid.uuid4().hex}
+
+def _catalog_changed():
+    recipe_query_cache.clear()
+    _catalog["generation"] = uuid.uuid4().hex
+
+# Ingredient -> recipe posting lists used for "what can I cook" matching. It is
+# rebuilt in the background, so results ranked on the old index are dropped on swap
+ingredient_index = IngredientIndexHolder(
+    lambda: get_db().recipes,
+    max_age=Config.RECIPE_CACHE_TTL,
+    on_swap=_catalog_changed
+)
+
+def _dietary_query(dietary_filters):
+    """
+    Build the Mongo clause for the active dietary filters
+    
+    Unselected flags are matched with ``$in: [True, False, None]`` so the
+    query constrains every field of the compound ``dietary_info`` index and
+    can use it whichever subset of filters is active. ``None`` also matches
+    documents missing the flag, which the index engine treats as unset too.
+    """
+    active = {key for key, value in (dietary_filters or {}).items() if value}
+    if not active:
+        return {}
+    
+    return {
+        f"dietary_info.{key}": True if key in active else {"$in": [True, False, None]}
+        for key in DIETARY_KEYS
+    }
+
+def _filters_key(dietary_filters):
+    return tuple(sorted(key for key, value in (dietary_filters or {}).items() if value))
+
+def _parse_keyset(cursor):
+    """Split a ``"<score>_<id>"`` page cursor into ``(float, ObjectId)``"""
+    try:
+        score, recipe_id = cursor.rsplit("_", 1)
+        return float(score), ObjectId(recipe_id)
+    except Exception:
+        return None
+
+def _copy_recipes(recipes):
+    # Callers annotate results (e.g. match_percentage), so never hand out cached dicts
+    return [dict(recipe) for recipe in recipes]
 
 class Recipe:
     @staticmethod
-    def get_all():
-        return list(mongo_db.recipes.find())
+    def get_all(dietary_filters=None, limit=None, after=None):
+        """
+        Get recipes in ``_id`` order, optionally restricted to the given dietary flags
+        
+        Args:
+            dietary_filters (dict, optional): Dietary flags recipes must have
+            limit (int, optional): Maximum number of recipes to return
+            after (str, optional): Page cursor from ``Recipe.page_cursor``
+            
+        Returns:
+            list: Matching recipes
+        """
+        cache_key = ("all", _filters_key(dietary_filters), limit, after)
+        cached = recipe_query_cache.get(cache_key)
+        if cached is not None:
+            return _copy_recipes(cached)
+        
+        query = _dietary_query(dietary_filters)
+        if after:
+            try:
+                query["_id"] = {"$gt": ObjectId(after)}
+            except Exception:
+                pass
+        
+        recipes = list(get_db().recipes.find(query).sort("_id", 1).limit(limit or 0))
+        Recipe._cache_documents(recipes)
+        recipe_query_cache.set(cache_key, recipes)
+        return _copy_recipes(recipes)
     
     @staticmethod
     def get_by_id(recipe_id):
         try:
-            return mongo_db.recipes.find_one({"_id": ObjectId(recipe_id)})
-        except:
+            object_id = ObjectId(recipe_id)
+        except Exception:
             return None
+        
+        recipe = recipe_cache.get(object_id)
+        if recipe is None:
+            recipe = get_db().recipes.find_one({"_id": object_id})
+            if recipe is None:
+                return None
+            recipe_cache.set(object_id, recipe)
+        
+        return dict(recipe)
     
     @staticmethod
-    def search_by_ingredients(ingredients_list, exclude_ingredients=None):
+    def get_many(recipe_ids):
+        """
+        Fetch several recipes in a single query
+        
+        Args:
+            recipe_ids (iterable): Recipe IDs as strings or ObjectIds
+            
+        Returns:
+            dict: Map of recipe ID string to recipe document. IDs that are
+            invalid or not found are left out.
+        """
+        found = {}
+        missing = []
+        for recipe_id in set(recipe_ids):
+            try:
+                object_id = ObjectId(recipe_id)
+            except Exception:
+                continue
+            
+            recipe = recipe_cache.get(object_id)
+            if recipe is None:
+                missing.append(object_id)
+            else:
+                found[str(object_id)] = dict(recipe)
+        
+        # Only the cache misses go to Mongo, still in a single query
+        if missing:
+            for recipe in get_db().recipes.find({"_id": {"$in": missing}}):
+                recipe_cache.set(recipe["_id"], recipe)
+                found[str(recipe["_id"])] = dict(recipe)
+        
+        return found
+    
+    @staticmethod
+    def search_by_ingredients(ingredients_list, exclude_ingredients=None, limit=None, dietary_filters=None, after=None,
+                              boosts=None):
         """
         Search for recipes that can be made with the given ingredients
         
+        The ranking engine is chosen by ``Config.RECIPE_MATCH_ENGINE``:
+        ``index`` ranks on the in-memory ingredient index, ``aggregate`` ranks
+        inside Mongo and only returns the fields recipe cards need.
+        
         Args:
             ingredients_list (list): List of ingredients names
             exclude_ingredients (list, optional): List of ingredients to exclude
+            limit (int, optional): Maximum number of recipes to return
+            dietary_filters (dict, optional): Dietary flags recipes must have
+            after (str, optional): Page cursor from ``Recipe.page_cursor``
+            boosts (dict, optional): Ingredient name -> weight, e.g. from
+                ``ExpiryQueue.weights``. When given, recipes are ranked by
+                ``use_up_score = match_percentage * (1 + sum of their boosts)``.
             
         Returns:
-            list: List of recipes that can be made with the given ingredients
+            list: List of recipes that can be made with the given ingredients,
+            best match first
         """
         if not ingredients_list:
             return []
         
-        # Create query to match recipes with ingredients from the list
-        query = {
-            "ingredients.name": {
-                "$in": ingredients_list
-            }
-        }
+        cache_key = ("ingredients", Config.RECIPE_MATCH_ENGINE, frozenset(ingredients_list),
+                     frozenset(exclude_ingredients or ()), limit, _filters_key(dietary_filters), after,
+                     frozenset(boosts.items()) if boosts is not None else None)
+        cached = recipe_query_cache.get(cache_key)
+        if cached is not None:
+            return _copy_recipes(cached)
+        
+        keyset = _parse_keyset(after) if after else None
+        if Config.RECIPE_MATCH_ENGINE == 'aggregate':
+            recipes = Recipe._aggregate_ingredient_matches(ingredients_list, exclude_ingredients, limit, dietary_filters,
+                                                           keyset, boosts)
+        else:
+            recipes = Recipe._index_ingredient_matches(ingredients_list, exclude_ingredients, limit, dietary_filters,
+                                                       keyset, boosts)
         
-        # Add exclusion if provided
+        recipe_query_cache.set(cache_key, recipes)
+        return _copy_recipes(recipes)
+    
+    @staticmethod
+    def _index_ingredient_matches(ingredients_list, exclude_ingredients, limit, dietary_filters, keyset, boosts=None):
+        # Rank on the inverted index, then load only the documents we return
+        index = ingredient_index.get()
+        if boosts is None:
+            matches = index.top_matches(ingredients_list, exclude_ingredients, limit, dietary_filters, keyset)
+        else:
+            matches = index.top_boosted(ingredients_list, boosts, exclude_ingredients, limit, dietary_filters, keyset)
+        documents = Recipe.get_many(index.recipe_ids[match[0]] for match in matches)
+        
+        recipes = []
+        for match in matches:
+            recipe = documents.get(str(index.recipe_ids[match[0]]))
+            if recipe:
+                recipe["match_percentage"] = match[1]
+                if boosts is not None:
+                    recipe["use_up_score"] = match[2]
+                recipes.append(recipe)
+        
+        return recipes
+    
+    @staticmethod
+    def _aggregate_ingredient_matches(ingredients_list, exclude_ingredients, limit, dietary_filters, keyset, boosts=None):
+        names = list(set(ingredients_list))
+        
+        match = {"ingredients.name": {"$in": names}}
         if exclude_ingredients:
-            query["ingredients.name"] = {
-                "$nin": exclude_ingredients
-            }
+            match["ingredients.name"]["$nin"] = list(set(exclude_ingredients))
+        match.update(_dietary_query(dietary_filters))
         
-        # Find recipes and calculate match percentage
-        recipes = list(mongo_db.recipes.find(query))
+        pipeline = [
+            {"$match": match},
+            {"$addFields": {
+                "match_percentage": {
+                    "$multiply": [
+                        {"$divide": [
+                            {"$size": {"$setIntersection": ["$ingredients.name", names]}},
+                            {"$size": "$ingredients"}
+                        ]},
+                        100
+                    ]
+                }
+            }}
+        ]
         
-        # Calculate match percentage for each recipe
-        for recipe in recipes:
-            total_ingredients = len(recipe["ingredients"])
-            matching_ingredients = sum(1 for i in recipe["ingredients"] if i["name"] in ingredients_list)
-            recipe["match_percentage"] = (matching_ingredients / total_ingredients) * 100
+        score_field = "match_percentage"
+        if boosts is not None:
+            score_field = "use_up_score"
+            bonus = [
+                {"$cond": [{"$in": [name, "$ingredients.name"]}, weight, 0]}
+                for name, weight in boosts.items()
+            ]
+            pipeline.append({"$addFields": {
+                "use_up_score": {"$multiply": ["$match_percentage", {"$add": [1, *bonus]}]}
+            }})
         
-        # Sort by match percentage (highest first)
-        recipes.sort(key=lambda x: x.get("match_percentage", 0), reverse=True)
+        if keyset:
+            after_score, after_id = keyset
+            pipeline.append({"$match": {"$or": [
+                {score_field: {"$lt": after_score}},
+                {score_field: after_score, "_id": {"$gt": after_id}}
+            ]}})
+        pipeline.append({"$sort": {score_field: -1, "_id": 1}})
+        if limit:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": RECIPE_CARD_FIELDS})
         
-        return recipes
+        return list(get_db().recipes.aggregate(pipeline))
     
     @staticmethod
-    def filter_by_dietary(recipes, dietary_filters):
+    def match_ingredients(ingredients_list, exclude_ingredients=None, limit=None, dietary_filters=None):
         """
-        Filter recipes based on dietary preferences
+        Lightweight version of search_by_ingredients that loads no documents
         
-        Args:
-            recipes (list): List of recipes to filter
-            dietary_filters (dict): Dictionary of dietary filters
-            
         Returns:
-            list: Filtered list of recipes
+            list: Dicts with ``id``, ``name`` and ``match_percentage``, best first
         """
-        if not dietary_filters:
-            return recipes
-        
-        filtered_recipes = []
-        
-        for recipe in recipes:
-            # Check if recipe matches all dietary filters
-            matches_all = True
-            
-            for key, value in dietary_filters.items():
-                if value and recipe.get("dietary_info", {}).get(key) != value:
-                    matches_all = False
-                    break
-            
-            if matches_all:
-                filtered_recipes.append(recipe)
+        if not ingredients_list:
+            return []
         
-        return filtered_recipes
+        index = ingredient_index.get()
+        return [
+            {
+                'id': str(index.recipe_ids[number]),
+                'name': index.recipe_names[number],
+                'match_percentage': match_percentage
+            }
+            for number, match_percentage in index.top_matches(ingredients_list, exclude_ingredients, limit, dietary_filters)
+        ]
     
     @staticmethod
-    def search_by_name(search_term):
+    def search_by_name(search_term, dietary_filters=None, limit=None, after=None):
         """
         Search for recipes by name
         
         Args:
             search_term (str): Term to search for
+            dietary_filters (dict, optional): Dietary flags recipes must have
+            limit (int, optional): Maximum number of recipes to return
+            after (str, optional): Page cursor from ``Recipe.page_cursor``
             
         Returns:
-            list: List of recipes matching the search term
+            list: List of recipes matching the search term, best text score first
         """
         if not search_term:
             return []
         
-        # Create text index if it doesn't exist
-        if "name_text" not in mongo_db.recipes.index_information():
-            mongo_db.recipes.create_index([("name", "text"), ("description", "text")])
+        cache_key = ("name", search_term.strip().lower(), _filters_key(dietary_filters), limit, after)
+        cached = recipe_query_cache.get(cache_key)
+        if cached is not None:
+            return _copy_recipes(cached)
+        
+        query = {"$text": {"$search": search_term}}
+        query.update(_dietary_query(dietary_filters))
+        
+        # Text scores can't be filtered in find(), so keyset paging needs a pipeline
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"score": {"$meta": "textScore"}}}
+        ]
+        keyset = _parse_keyset(after) if after else None
+        if keyset:
+            after_score, after_id = keyset
+            pipeline.append({"$match": {"$or": [
+                {"score": {"$lt": after_score}},
+                {"score": after_score, "_id": {"$gt": after_id}}
+            ]}})
+        pipeline.append({"$sort": {"score": -1, "_id": 1}})
+        if limit:
+            pipeline.append({"$limit": limit})
+        
+        recipes = list(get_db().recipes.aggregate(pipeline))
+        recipe_query_cache.set(cache_key, recipes)
+        return _copy_recipes(recipes)
+    
+    @staticmethod
+    def page_cursor(recipe):
+        """
+        Build the cursor for the page that starts after ``recipe``
         
-        return list(mongo_db.recipes.find({"$text": {"$search": search_term}}))
+        Ingredient and name searches page on ``(score, _id)`` (the use-up score
+        when boosted), plain listings on ``_id`` alone.
+        """
+        if "use_up_score" in recipe:
+            return f"{recipe['use_up_score']!r}_{recipe['_id']}"
+        if "match_percentage" in recipe:
+            return f"{recipe['match_percentage']!r}_{recipe['_id']}"
+        if "score" in recipe:
+            return f"{recipe['score']!r}_{recipe['_id']}"
+        return str(recipe["_id"])
     
     @staticmethod
     def get_recipe_ingredients(recipe_id):
@@ -123,4 +366,106 @@ class Recipe:
         if not recipe:
             return []
         
-        return recipe.get("ingredients", [])
\ No newline at end of file
+        return recipe.get("ingredients", [])
+    
+    @staticmethod
+    def insert(recipe):
+        """
+        Insert a new recipe and invalidate cached query results
+        
+        Args:
+            recipe (dict): Recipe document
+            
+        Returns:
+            str: ID of the inserted recipe
+        """
+        units.normalize_ingredients(recipe.get("ingredients"))
+        result = get_db().recipes.insert_one(recipe)
+        Recipe.invalidate(result.inserted_id)
+        return str(result.inserted_id)
+    
+    @staticmethod
+    def update(recipe_id, fields):
+        """
+        Update fields of a recipe and invalidate its cache entries
+        
+        Changing the ingredients also refreshes the grocery totals of every
+        meal plan that uses the recipe.
+        
+        Args:
+            recipe_id (str): Recipe ID
+            fields (dict): Fields to set
+            
+        Returns:
+            bool: True if a recipe was modified
+        """
+        try:
+            object_id = ObjectId(recipe_id)
+        except Exception:
+            return False
+        
+        if "ingredients" in fields:
+            units.normalize_ingredients(fields["ingredients"])
+        
+        result = get_db().recipes.update_one({"_id": object_id}, {"$set": fields})
+        Recipe.invalidate(object_id)
+        
+        if "ingredients" in fields and result.modified_count:
+            # Imported here; the meal plan model imports this one
+            from models.meal_plan import MealPlan
+            MealPlan.refresh_grocery_for_recipe(recipe_id)
+        return result.modified_count > 0
+    
+    @staticmethod
+    def invalidate(recipe_id=None):
+        """
+        Drop cached data for one recipe, or for every recipe if no ID is given
+        
+        Any recipe change can alter listing and search results, so cached
+        query results and the ingredient index are always dropped and the
+        catalog generation moves on.
+        """
+        if recipe_id is None:
+            recipe_cache.clear()
+        else:
+            recipe_cache.pop(ObjectId(recipe_id))
+        _catalog_changed()
+        ingredient_index.invalidate()
+    
+    @staticmethod
+    def generation():
+        """
+        Get a token that changes whenever the recipe catalog does
+        
+        Include it in the key of anything memoized with ``Inventory.memoize``
+        that is built from recipes.
+        
+        Returns:
+            str: The current catalog generation
+        """
+        return _catalog["generation"]
+    
+    @staticmethod
+    def cache_stats():
+        return {
+            'documents': recipe_cache.stats(),
+            'queries': recipe_query_cache.stats()
+        }
+    
+    @staticmethod
+    def start_change_listener():
+        """
+        Invalidate the recipe cache on changes made by other processes
+        
+        Uses a Mongo change stream, so it requires a replica set.
+        """
+        def on_change(change):
+            document_key = change.get("documentKey")
+            Recipe.invalidate(document_key["_id"] if document_key else None)
+        
+        return watch_collection(get_db().recipes, on_change)
+    
+    @staticmethod
+    def _cache_documents(recipes):
+        for recipe in recipes:
+            recipe_cache.set(recipe["_id"], recipe)
\ No newline at end of file
@@ -0,0 +1,174 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Unit -> (base unit, factor to base). Mass normalizes to grams, volume to
+# milliliters; count-like units normalize to themselves.
+UNIT_FACTORS = {
+    'mg': ('g', 0.001),
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'oz': ('g', 28.349523125),
+    'lb': ('g', 453.59237),
+    'ml': ('ml', 1.0),
+    'l': ('ml', 1000.0),
+    'cup': ('ml', 236.5882365),
+    'cups': ('ml', 236.5882365),
+    'tbsp': ('ml', 14.78676478125),
+    'tsp': ('ml', 4.92892159375),
+    'pinch': ('ml', 0.3080575996),
+    'whole': ('whole', 1.0),
+    'pieces': ('whole', 1.0),
+    'large': ('whole', 1.0),
+    'medium': ('whole', 1.0),
+    'small': ('whole', 1.0),
+    'slices': ('slices', 1.0),
+    'cloves': ('cloves', 1.0),
+    'head': ('head', 1.0)
+}
+
+# Grams per milliliter, so volume and mass amounts of the same ingredient compare
+DENSITIES = {
+    'water': 1.0,
+    'milk': 1.03,
+    'cream': 1.01,
+    'yogurt': 1.03,
+    'butter': 0.911,
+    'olive oil': 0.91,
+    'sesame oil': 0.92,
+    'vegetable oil': 0.92,
+    'honey': 1.42,
+    'soy sauce': 1.2,
+    'lemon juice': 1.03,
+    'vinegar': 1.01,
+    'mustard': 1.05,
+    'tomato paste': 1.1,
+    'salt': 1.2,
+    'sugar': 0.85,
+    'brown sugar': 0.83,
+    'flour': 0.53,
+    'rice': 0.85,
+    'oats': 0.41,
+    'black pepper': 0.46,
+    'chili powder': 0.54,
+    'cumin': 0.43,
+    'paprika': 0.46,
+    'red pepper flakes': 0.35,
+    'parmesan cheese': 0.42
+}
+
+@lru_cache(maxsize=4096)
+def conversion(unit, ingredient_name=None):
+    """
+    Look up how to normalize an amount of ``ingredient_name`` in ``unit``
+
+    Volumes of ingredients with a known density normalize to grams.
+
+    Returns:
+        tuple: ``(base_unit, factor)``; unknown units normalize to themselves
+    """
+    unit = (unit or '').strip().lower()
+    base_unit, factor = UNIT_FACTORS.get(unit, (unit, 1.0))
+
+    density = DENSITIES.get((ingredient_name or '').strip().lower())
+    if base_unit == 'ml' and density:
+        return 'g', factor * density
+
+    return base_unit, factor
+
+def normalize(amount, unit, ingredient_name=None):
+    """
+    Convert an amount to its canonical base unit
+
+    Returns:
+        tuple: ``(base_amount, base_unit)``
+    """
+    base_unit, factor = conversion(unit, ingredient_name)
+    return (amount or 0) * factor, base_unit
+
+def normalize_many(amounts, units, ingredient_names=None):
+    """
+    Vectorized ``normalize`` for many amounts at once
+
+    Args:
+        amounts (sequence): Raw amounts
+        units (sequence): Unit of each amount
+        ingredient_names (sequence, optional): Ingredient of each amount
+
+    Returns:
+        tuple: ``(numpy array of base amounts, list of base units)``
+    """
+    if ingredient_names is None:
+        ingredient_names = [None] * len(units)
+
+    lookups = [conversion(unit, name) for unit, name in zip(units, ingredient_names)]
+    factors = np.fromiter((factor for _, factor in lookups), dtype=np.float64, count=len(lookups))
+    base_amounts = np.asarray(amounts, dtype=np.float64) * factors
+    return base_amounts, [base_unit for base_unit, _ in lookups]
+
+def from_base(base_amount, unit, ingredient_name=None):
+    """Convert a base-unit amount back into ``unit``"""
+    _, factor = conversion(unit, ingredient_name)
+    return base_amount / factor
+
+def shortfall(ingredient, inventory):
+    """
+    Work out how much of a recipe ingredient the user is missing
+
+    Every inventory row of the ingredient in a convertible unit counts, like
+    the grocery list, so two 200 g bags of flour cover 300 g. Uses the base
+    amounts stored at write time, so this is plain arithmetic unless a
+    legacy row or document lacks them.
+
+    Args:
+        ingredient (dict): Recipe ingredient with ``name``, ``amount``, ``unit``
+        inventory (InventorySnapshot): The user's inventory
+
+    Returns:
+        float: Missing amount in the ingredient's own unit; 0 if there is
+        enough. Stock only held in units that can't be converted is compared
+        as a raw number, as before normalization existed.
+    """
+    name = ingredient.get('name')
+    amount = ingredient.get('amount', 0) or 0
+    unit = ingredient.get('unit', '')
+
+    item = inventory.get(name)
+    if item is None:
+        return amount
+
+    needed_base = ingredient.get('base_amount')
+    needed_unit = ingredient.get('base_unit')
+    if needed_unit is None:
+        needed_base, needed_unit = normalize(amount, unit, name)
+
+    have_base = inventory.base_quantity(name, needed_unit)
+    if not have_base:
+        return max(amount - item.quantity, 0)
+
+    missing_base = needed_base - have_base
+    return from_base(missing_base, unit, name) if missing_base > 0 else 0
+
+def normalize_ingredients(ingredients):
+    """
+    Store base amounts next to the raw amounts of recipe ingredients
+
+    Args:
+        ingredients (list): Recipe ingredient dicts, updated in place
+
+    Returns:
+        list: The same ingredient dicts
+    """
+    if not ingredients:
+        return ingredients
+
+    base_amounts, base_units = normalize_many(
+        [i.get('amount', 0) or 0 for i in ingredients],
+        [i.get('unit', '') for i in ingredients],
+        [i.get('name') for i in ingredients]
+    )
+    for ingredient, base_amount, base_unit in zip(ingredients, base_amounts.tolist(), base_units):
+        ingredient['base_amount'] = base_amount
+        ingredient['base_unit'] = base_unit
+
+    return ingredients
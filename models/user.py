@@ -1,23 +1,50 @@
+import time
+from flask import session, has_request_context
 from flask_login import UserMixin
 import bcrypt
 from database.mysql_setup import get_connection
+from models.user_preferences import UserPreferences
+from config import Config
+
+# Session key holding the logged-in user and their preferences
+USER_CACHE_KEY = 'user_cache'
 
 class User(UserMixin):
-    def __init__(self, id, username, email, password=None):
+    BY_EMAIL_SQL = "SELECT * FROM users WHERE email = %s"
+    
+    def __init__(self, id, username, email, password=None, preferences=None):
         self.id = id
         self.username = username
         self.email = email
         self.password = password
+        self.preferences = preferences or UserPreferences(id)
     
     def get_id(self):
         return str(self.id)
     
+    def update_preferences(self, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free):
+        preferences = UserPreferences.update(self.id, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free)
+        if preferences:
+            self.preferences = preferences
+            User.invalidate_cache(self.id)
+        return preferences
+    
     @staticmethod
     def get_by_id(user_id):
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+        # Load the user and their preferences in one round-trip
+        cursor.execute(
+            """
+            SELECT u.id, u.username, u.email,
+                   p.is_vegetarian, p.is_vegan, p.is_gluten_free, p.is_dairy_free
+            FROM users u
+            LEFT JOIN user_preferences p ON p.user_id = u.id
+            WHERE u.id = %s
+            """,
+            (user_id,)
+        )
         user_data = cursor.fetchone()
         cursor.close()
         
@@ -27,15 +54,62 @@ class User(UserMixin):
         return User(
             id=user_data['id'],
             username=user_data['username'],
-            email=user_data['email']
+            email=user_data['email'],
+            preferences=UserPreferences(
+                user_id=user_data['id'],
+                is_vegetarian=user_data['is_vegetarian'],
+                is_vegan=user_data['is_vegan'],
+                is_gluten_free=user_data['is_gluten_free'],
+                is_dairy_free=user_data['is_dairy_free']
+            )
         )
     
+    @staticmethod
+    def load_cached(user_id):
+        """
+        Load a user for Flask-Login, reusing the copy cached in the session
+        
+        The cached copy is trusted for ``Config.USER_CACHE_TTL`` seconds and
+        dropped whenever the user's preferences change.
+        """
+        cached = session.get(USER_CACHE_KEY)
+        if (cached and str(cached['id']) == str(user_id)
+                and time.time() - cached['cached_at'] < Config.USER_CACHE_TTL):
+            return User(
+                id=cached['id'],
+                username=cached['username'],
+                email=cached['email'],
+                preferences=UserPreferences(cached['id'], **cached['preferences'])
+            )
+        
+        user = User.get_by_id(user_id)
+        if user:
+            session[USER_CACHE_KEY] = {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'preferences': user.preferences.to_dict(),
+                'cached_at': time.time()
+            }
+        else:
+            session.pop(USER_CACHE_KEY, None)
+        return user
+    
+    @staticmethod
+    def invalidate_cache(user_id):
+        if not has_request_context():
+            return
+        
+        cached = session.get(USER_CACHE_KEY)
+        if cached and str(cached['id']) == str(user_id):
+            session.pop(USER_CACHE_KEY, None)
+    
     @staticmethod
     def get_by_email(email):
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        cursor.execute(User.BY_EMAIL_SQL, (email,))
         user_data = cursor.fetchone()
         cursor.close()
         
@@ -0,0 +1,81 @@
+from database.mysql_setup import get_connection
+
+class UserPreferences:
+    BY_USER_SQL = "SELECT * FROM user_preferences WHERE user_id = %s"
+
+    def __init__(self, user_id, is_vegetarian=False, is_vegan=False, is_gluten_free=False, is_dairy_free=False):
+        self.user_id = user_id
+        self.is_vegetarian = bool(is_vegetarian)
+        self.is_vegan = bool(is_vegan)
+        self.is_gluten_free = bool(is_gluten_free)
+        self.is_dairy_free = bool(is_dairy_free)
+
+    def dietary_filters(self):
+        """
+        Get the dietary filters the user has switched on
+
+        Returns:
+            dict: e.g. ``{'vegan': True}``, empty if no filter is active
+        """
+        dietary_filters = {
+            'vegetarian': self.is_vegetarian,
+            'vegan': self.is_vegan,
+            'gluten_free': self.is_gluten_free,
+            'dairy_free': self.is_dairy_free
+        }
+        return {k: True for k, v in dietary_filters.items() if v}
+
+    def to_dict(self):
+        return {
+            'is_vegetarian': self.is_vegetarian,
+            'is_vegan': self.is_vegan,
+            'is_gluten_free': self.is_gluten_free,
+            'is_dairy_free': self.is_dairy_free
+        }
+
+    @staticmethod
+    def get_by_user_id(user_id):
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute(UserPreferences.BY_USER_SQL, (user_id,))
+        data = cursor.fetchone()
+        cursor.close()
+
+        if not data:
+            return UserPreferences(user_id)
+
+        return UserPreferences(
+            user_id=data['user_id'],
+            is_vegetarian=data['is_vegetarian'],
+            is_vegan=data['is_vegan'],
+            is_gluten_free=data['is_gluten_free'],
+            is_dairy_free=data['is_dairy_free']
+        )
+
+    @staticmethod
+    def update(user_id, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free):
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                """
+                INSERT INTO user_preferences
+                (user_id, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                is_vegetarian = VALUES(is_vegetarian), is_vegan = VALUES(is_vegan),
+                is_gluten_free = VALUES(is_gluten_free), is_dairy_free = VALUES(is_dairy_free)
+                """,
+                (user_id, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free)
+            )
+            conn.commit()
+            cursor.close()
+
+            return UserPreferences(user_id, is_vegetarian, is_vegan, is_gluten_free, is_dairy_free)
+        except Exception as e:
+            conn.rollback()
+            cursor.close()
+            print(f"Error updating user preferences: {e}")
+            return None
@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
-from models.user import User
+from models.user import User, USER_CACHE_KEY
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
@@ -25,6 +25,12 @@ class LoginForm(FlaskForm):
     remember = BooleanField('Remember Me')
     submit = SubmitField('Login')
 
+class PreferencesForm(FlaskForm):
+    vegetarian = BooleanField('Vegetarian')
+    vegan = BooleanField('Vegan')
+    gluten_free = BooleanField('Gluten Free')
+    dairy_free = BooleanField('Dairy Free')
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
@@ -70,9 +76,33 @@ def login():
 @login_required
 def logout():
     logout_user()
+    # The session cookie is signed, not encrypted; don't leave the user's details in it
+    session.pop(USER_CACHE_KEY, None)
     return redirect(url_for('index'))
 
-@auth_bp.route('/profile')
+@auth_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    return render_template('auth/profile.html')
\ No newline at end of file
+    preferences = current_user.preferences
+    form = PreferencesForm(data={
+        'vegetarian': preferences.is_vegetarian,
+        'vegan': preferences.is_vegan,
+        'gluten_free': preferences.is_gluten_free,
+        'dairy_free': preferences.is_dairy_free
+    })
+    
+    if form.validate_on_submit():
+        preferences = current_user.update_preferences(
+            is_vegetarian=form.vegetarian.data,
+            is_vegan=form.vegan.data,
+            is_gluten_free=form.gluten_free.data,
+            is_dairy_free=form.dairy_free.data
+        )
+        
+        if preferences:
+            flash('Your dietary preferences have been updated.', 'success')
+        else:
+            flash('Error updating preferences. Please try again.', 'danger')
+        return redirect(url_for('auth.profile'))
+    
+    return render_template('auth/profile.html', form=form)
\ No newline at end of file
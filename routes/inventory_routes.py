@@ -54,11 +54,11 @@ class InventoryForm(FlaskForm):
 @inventory_bp.route('/')
 @login_required
 def index():
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    expiring_items = Inventory.get_expiring_items(current_user.id)
+    # One query serves both the full list and the expiring items
+    inventory = Inventory.snapshot(current_user.id)
     return render_template('inventory/index.html', 
-                          inventory_items=inventory_items, 
-                          expiring_items=expiring_items,
+                          inventory_items=inventory.items, 
+                          expiring_items=inventory.expiring(),
                           categories=CATEGORIES,
                           datetime=datetime)
 
@@ -141,10 +141,9 @@ def delete(item_id):
 @inventory_bp.route('/api/items', methods=['GET'])
 @login_required
 def api_get_items():
-    inventory_items = Inventory.get_by_user_id(current_user.id)
     items_list = []
     
-    for item in inventory_items:
+    for item in Inventory.snapshot(current_user.id):
         items_list.append({
             'id': item.id,
             'ingredient_name': item.ingredient_name,
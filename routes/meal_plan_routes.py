@@ -3,11 +3,17 @@ from flask_login import login_required, current_user
 from models.meal_plan import MealPlan
 from models.recipe import Recipe
 from models.inventory import Inventory
+from models.planner import plan_week
+from config import Config
+from database.loader import load_concurrently
+import time
 from datetime import datetime, timedelta
-from database.mysql_setup import get_connection
 
 meal_plan_bp = Blueprint('meal_plan', __name__, url_prefix='/meal-plan')
 
+# Most weeks a single grocery list can cover
+MAX_GROCERY_WEEKS = 8
+
 @meal_plan_bp.route('/')
 @login_required
 def index():
@@ -16,44 +22,41 @@ def index():
     days_since_monday = today.weekday()
     week_start_date = today - timedelta(days=days_since_monday)
     
-    # Get meal plans for current week
-    meal_plans = MealPlan.get_by_user(current_user.id, week_start_date)
+    user_id = current_user.id
+    dietary_filters = current_user.preferences.dietary_filters()
     
-    # If no meal plan exists for this week, create one
-    if not meal_plans:
-        meal_plan = MealPlan.create(current_user.id, week_start_date)
-        meal_plans = [meal_plan] if meal_plan else []
-    
-    # Get user's inventory ingredients for recipe suggestions
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    ingredient_names = [item.ingredient_name for item in inventory_items]
-    
-    # Get recipe suggestions based on inventory
-    recipe_suggestions = Recipe.search_by_ingredients(ingredient_names)
-    
-    # Apply dietary preferences to suggestions
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_preferences WHERE user_id = %s", (current_user.id,))
-    preferences = cursor.fetchone()
-    cursor.close()
-    
-    if preferences and any([preferences['is_vegetarian'], preferences['is_vegan'], 
-                           preferences['is_gluten_free'], preferences['is_dairy_free']]):
-        dietary_filters = {
-            'vegetarian': preferences['is_vegetarian'],
-            'vegan': preferences['is_vegan'],
-            'gluten_free': preferences['is_gluten_free'],
-            'dairy_free': preferences['is_dairy_free']
-        }
-        # Only apply filters that are true
-        active_filters = {k: v for k, v in dietary_filters.items() if v}
+    def load_meal_plans():
+        # Get meal plans for current week
+        meal_plans = MealPlan.get_by_user(user_id, week_start_date)
         
-        if active_filters:
-            recipe_suggestions = Recipe.filter_by_dietary(recipe_suggestions, active_filters)
-    
-    # Limit to top 10 suggestions
-    recipe_suggestions = recipe_suggestions[:10]
+        # If no meal plan exists for this week, create one
+        if not meal_plans:
+            meal_plan = MealPlan.create(user_id, week_start_date)
+            meal_plans = [meal_plan] if meal_plan else []
+        return meal_plans
+    
+    def load_suggestions():
+        # Get user's inventory ingredients for recipe suggestions
+        inventory = Inventory.snapshot(user_id)
+        
+        # Get the top 10 recipe suggestions that use the inventory and fit the user's diet,
+        # favouring recipes that use up soon-to-expire stock. Reused until the inventory
+        # or the catalog changes; expiry weights also change by the day.
+        return Inventory.memoize(
+            user_id,
+            ('meal_plan.index', Recipe.generation(), tuple(sorted(dietary_filters)), today),
+            lambda: Recipe.search_by_ingredients(
+                inventory.names,
+                limit=10,
+                dietary_filters=dietary_filters,
+                boosts=Inventory.expiry_queue(user_id).weights(Config.EXPIRY_RANKING_DAYS)
+            )
+        )
+    
+    # The plan and the suggestions don't depend on each other
+    loaded = load_concurrently(meal_plans=load_meal_plans, recipe_suggestions=load_suggestions)
+    meal_plans = loaded['meal_plans']
+    recipe_suggestions = loaded['recipe_suggestions']
     
     return render_template('meal_plan/index.html', 
                           meal_plans=meal_plans, 
@@ -98,6 +101,9 @@ def remove_recipe(item_id):
 @meal_plan_bp.route('/generate', methods=['GET'])
 @login_required
 def generate_plan():
+    # Candidate lookup and search share one deadline, so a slow lookup shortens the search
+    deadline = time.perf_counter() + Config.MEAL_PLAN_DEADLINE_MS / 1000
+    
     # Get the meal plan ID from the query string
     plan_id = request.args.get('plan_id')
     
@@ -106,57 +112,35 @@ def generate_plan():
         return redirect(url_for('meal_plan.index'))
     
     # Get user's inventory ingredients
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    ingredient_names = [item.ingredient_name for item in inventory_items]
-    
-    # Get recipes that can be made with user's ingredients
-    available_recipes = Recipe.search_by_ingredients(ingredient_names)
-    
-    # Apply dietary preferences
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_preferences WHERE user_id = %s", (current_user.id,))
-    preferences = cursor.fetchone()
-    cursor.close()
-    
-    if preferences and any([preferences['is_vegetarian'], preferences['is_vegan'], 
-                           preferences['is_gluten_free'], preferences['is_dairy_free']]):
-        dietary_filters = {
-            'vegetarian': preferences['is_vegetarian'],
-            'vegan': preferences['is_vegan'],
-            'gluten_free': preferences['is_gluten_free'],
-            'dairy_free': preferences['is_dairy_free']
-        }
-        # Only apply filters that are true
-        active_filters = {k: v for k, v in dietary_filters.items() if v}
-        
-        if active_filters:
-            available_recipes = Recipe.filter_by_dietary(available_recipes, active_filters)
+    inventory = Inventory.snapshot(current_user.id)
     
-    # Generate a meal plan (simple version - just assign random recipes)
-    # In a real app, this would be more sophisticated
-    meal_types = ['breakfast', 'lunch', 'dinner']
+    # Get the best-matching recipes that fit the user's diet as candidates
+    candidates = Recipe.search_by_ingredients(
+        inventory.names,
+        limit=Config.MEAL_PLAN_CANDIDATES,
+        dietary_filters=current_user.preferences.dietary_filters()
+    )
     
-    if len(available_recipes) < 3:
+    if len(candidates) < 3:
         flash('Not enough recipes available to generate a meal plan.', 'warning')
         return redirect(url_for('meal_plan.index'))
     
-    # Clear existing meal plan
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM meal_plan_items WHERE meal_plan_id = %s", (plan_id,))
-    conn.commit()
-    cursor.close()
-    
-    # Add recipes to meal plan for each day of the week
-    for day in range(7):  # 0-6 for Monday to Sunday
-        for meal_type in meal_types:
-            # Pick a random recipe that matches the criteria
-            import random
-            recipe = random.choice(available_recipes)
-            
-            # Add to meal plan
-            MealPlan.add_item(plan_id, str(recipe['_id']), day, meal_type)
+    # The planner needs ingredients, tags and nutrition, not just recipe card fields
+    documents = Recipe.get_many(recipe['_id'] for recipe in candidates)
+    available_recipes = [documents[str(recipe['_id'])] for recipe in candidates if str(recipe['_id']) in documents]
+    
+    # Score inventory use, expiring items, meal type tags, nutrition and variety
+    items = plan_week(
+        available_recipes,
+        inventory.names,
+        Inventory.expiry_queue(current_user.id).expiring(Config.EXPIRY_RANKING_DAYS),
+        deadline=deadline
+    )
+    
+    # Replace the existing meal plan in one transaction
+    if not MealPlan.replace_items(plan_id, items):
+        flash('Error generating meal plan.', 'danger')
+        return redirect(url_for('meal_plan.index'))
     
     flash('Meal plan generated successfully!', 'success')
     return redirect(url_for('meal_plan.index'))
@@ -164,67 +148,27 @@ def generate_plan():
 @meal_plan_bp.route('/grocery-list')
 @login_required
 def grocery_list():
-    # Get the current meal plan
+    # Get the current meal plan, plus following weeks for bulk shopping
     today = datetime.now().date()
     days_since_monday = today.weekday()
     week_start_date = today - timedelta(days=days_since_monday)
+    weeks = min(max(request.args.get('weeks', 1, type=int), 1), MAX_GROCERY_WEEKS)
     
-    meal_plans = MealPlan.get_by_user(current_user.id, week_start_date)
+    meal_plans = MealPlan.get_by_user_range(
+        current_user.id,
+        week_start_date,
+        week_start_date + timedelta(weeks=weeks - 1)
+    )
     
     if not meal_plans:
         flash('No meal plan found for this week.', 'warning')
         return redirect(url_for('meal_plan.index'))
     
-    meal_plan = meal_plans[0]
-    
-    # Get user's inventory
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    user_ingredients = {item.ingredient_name: {'quantity': item.quantity, 'unit': item.unit} 
-                      for item in inventory_items}
-    
-    # Compile grocery list from meal plan
-    grocery_list = {}
-    
-    for item in meal_plan.items:
-        recipe = item['recipe']
-        
-        for ingredient in recipe.get('ingredients', []):
-            name = ingredient.get('name')
-            amount = ingredient.get('amount', 0)
-            unit = ingredient.get('unit', '')
-            
-            # Check if user already has this ingredient
-            if name in user_ingredients:
-                # If user has enough, skip
-                if user_ingredients[name]['quantity'] >= amount:
-                    continue
-                # Otherwise, add the difference
-                needed_amount = amount - user_ingredients[name]['quantity']
-            else:
-                needed_amount = amount
-            
-            # Add to grocery list
-            if name in grocery_list:
-                if grocery_list[name]['unit'] == unit:
-                    grocery_list[name]['amount'] += needed_amount
-                else:
-                    # If units don't match, keep them separate
-                    alt_key = f"{name} ({unit})"
-                    if alt_key in grocery_list:
-                        grocery_list[alt_key]['amount'] += needed_amount
-                    else:
-                        grocery_list[alt_key] = {
-                            'name': name,
-                            'amount': needed_amount,
-                            'unit': unit
-                        }
-            else:
-                grocery_list[name] = {
-                    'name': name,
-                    'amount': needed_amount,
-                    'unit': unit
-                }
+    # Read the precomputed totals for every plan, net of the user's inventory
+    grocery_list = MealPlan.get_grocery_list(current_user.id, [plan.id for plan in meal_plans])
     
     return render_template('meal_plan/grocery_list.html', 
-                          grocery_list=grocery_list.values(),
-                          meal_plan=meal_plan)
\ No newline at end of file
+                          grocery_list=grocery_list,
+                          meal_plan=meal_plans[0],
+                          meal_plans=meal_plans,
+                          weeks=weeks)
\ No newline at end of file
@@ -1,68 +1,92 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app, \
+    get_flashed_messages, stream_template, Response
 from flask_login import login_required, current_user
 from models.recipe import Recipe
 from models.inventory import Inventory
 from models.completed_recipe import CompletedRecipe
-from database.mysql_setup import get_connection
+from models import units
+from database.loader import load_concurrently
+from datetime import datetime
 
 recipe_bp = Blueprint('recipe', __name__, url_prefix='/recipe')
 
+# Number of history entries shown per page on /recipe/completed
+COMPLETED_PAGE_SIZE = 20
+
+def _paginate(recipes, page_size, endpoint):
+    """
+    Trim a ``page_size + 1`` result list to one page
+    
+    Returns:
+        tuple: The page and the URL of the next page (None on the last page)
+    """
+    if len(recipes) <= page_size:
+        return recipes, None
+    
+    recipes = recipes[:page_size]
+    args = request.args.to_dict()
+    args['after'] = Recipe.page_cursor(recipes[-1])
+    return recipes, url_for(endpoint, **args)
+
 @recipe_bp.route('/')
 @login_required
 def index():
-    # Get user's inventory ingredients
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    ingredient_names = [item.ingredient_name for item in inventory_items]
-    
-    # Get recipes that can be made with these ingredients
-    recipes = Recipe.search_by_ingredients(ingredient_names)
-    
-    # Get user's dietary preferences
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_preferences WHERE user_id = %s", (current_user.id,))
-    preferences = cursor.fetchone()
-    cursor.close()
-    
-    # Apply dietary filters if user has preferences
-    if preferences:
-        dietary_filters = {
-            'vegetarian': preferences['is_vegetarian'],
-            'vegan': preferences['is_vegan'],
-            'gluten_free': preferences['is_gluten_free'],
-            'dairy_free': preferences['is_dairy_free']
-        }
-        # Only apply filters that are true
-        active_filters = {k: v for k, v in dietary_filters.items() if v}
-        
-        if active_filters:
-            recipes = Recipe.filter_by_dietary(recipes, active_filters)
+    user_id = current_user.id
     
-    # Get recently completed recipes
-    completed_recipes = CompletedRecipe.get_by_user(current_user.id, limit=5)
+    # "Use it up" mode ranks recipes that consume soon-to-expire stock first
+    sort = request.args.get('sort')
+    after = request.args.get('after')
+    dietary_filters = current_user.preferences.dietary_filters()
+    page_size = current_app.config['RECIPE_PAGE_SIZE']
+    
+    def load_recipes():
+        # Get user's inventory ingredients
+        inventory = Inventory.snapshot(user_id)
+        
+        def suggest():
+            boosts = None
+            if sort == 'expiring':
+                boosts = Inventory.expiry_queue(user_id).weights(current_app.config['EXPIRY_RANKING_DAYS'])
+            
+            # Get a page of recipes that can be made with these ingredients and fit the user's diet
+            return Recipe.search_by_ingredients(
+                inventory.names,
+                limit=page_size + 1,
+                dietary_filters=dietary_filters,
+                after=after,
+                boosts=boosts
+            )
+        
+        # Reused until the inventory or the catalog changes; expiry weights also change by the day
+        recipes = Inventory.memoize(
+            user_id,
+            ('recipe.index', Recipe.generation(), sort, after, page_size, tuple(sorted(dietary_filters)),
+             datetime.now().date()),
+            suggest
+        )
+        return inventory, recipes
+    
+    # Suggestions and recently completed recipes don't depend on each other
+    loaded = load_concurrently(
+        completed_recipes=lambda: CompletedRecipe.get_by_user(user_id, limit=5),
+        recipes=load_recipes
+    )
+    inventory, recipes = loaded['recipes']
+    completed_recipes = loaded['completed_recipes']
+    recipes, next_url = _paginate(recipes, page_size, 'recipe.index')
     
     return render_template('recipe/index.html', 
                           recipes=recipes, 
+                          next_url=next_url,
+                          sort=sort,
                           completed_recipes=completed_recipes,
-                          inventory_count=len(inventory_items))
+                          inventory_count=len(inventory))
 
 @recipe_bp.route('/search', methods=['GET', 'POST'])
 @login_required
 def search():
     search_term = request.args.get('term', '')
     
-    if search_term:
-        recipes = Recipe.search_by_name(search_term)
-    else:
-        recipes = Recipe.get_all()
-    
-    # Get user's dietary preferences
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_preferences WHERE user_id = %s", (current_user.id,))
-    preferences = cursor.fetchone()
-    cursor.close()
-    
     # Apply filters from form
     vegetarian = request.args.get('vegetarian') == 'on'
     vegan = request.args.get('vegan') == 'on'
@@ -80,50 +104,57 @@ def search():
     if dairy_free:
         dietary_filters['dairy_free'] = True
     
-    # Apply dietary filters if any are selected
-    if dietary_filters:
-        recipes = Recipe.filter_by_dietary(recipes, dietary_filters)
+    # Dietary filters are part of the query, so excluded recipes are never fetched
+    page_size = current_app.config['RECIPE_PAGE_SIZE']
+    after = request.args.get('after')
+    if search_term:
+        recipes = Recipe.search_by_name(search_term, dietary_filters=dietary_filters, limit=page_size + 1, after=after)
+    else:
+        recipes = Recipe.get_all(dietary_filters=dietary_filters, limit=page_size + 1, after=after)
+    recipes, next_url = _paginate(recipes, page_size, 'recipe.search')
+    
+    # Pop flashed messages before streaming starts; the session can't be saved afterwards
+    get_flashed_messages(with_categories=True)
     
-    return render_template('recipe/search.html', 
-                          recipes=recipes, 
-                          search_term=search_term,
-                          preferences=preferences)
+    return Response(stream_template('recipe/search.html', 
+                                    recipes=recipes, 
+                                    next_url=next_url,
+                                    search_term=search_term,
+                                    preferences=current_user.preferences))
 
 @recipe_bp.route('/<recipe_id>')
 @login_required
 def detail(recipe_id):
-    recipe = Recipe.get_by_id(recipe_id)
+    user_id = current_user.id
+    
+    # The recipe and the user's inventory load at the same time
+    loaded = load_concurrently(
+        recipe=lambda: Recipe.get_by_id(recipe_id),
+        inventory=lambda: Inventory.snapshot(user_id)
+    )
+    recipe = loaded['recipe']
     
     if not recipe:
         flash('Recipe not found.', 'danger')
         return redirect(url_for('recipe.index'))
     
     # Check if user has the ingredients
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    user_ingredients = {item.ingredient_name: {'quantity': item.quantity, 'unit': item.unit} 
-                      for item in inventory_items}
+    inventory = loaded['inventory']
     
     has_all_ingredients = True
     missing_ingredients = []
     
     for ingredient in recipe.get('ingredients', []):
         name = ingredient.get('name')
-        amount = ingredient.get('amount', 0)
-        unit = ingredient.get('unit', '')
         
-        if name not in user_ingredients:
-            has_all_ingredients = False
-            missing_ingredients.append({
-                'name': name,
-                'amount': amount,
-                'unit': unit
-            })
-        elif user_ingredients[name]['quantity'] < amount:
+        # Compares normalized totals, so 0.5 kg on hand covers 400 g needed
+        missing_amount = units.shortfall(ingredient, inventory)
+        if missing_amount > 0:
             has_all_ingredients = False
             missing_ingredients.append({
                 'name': name,
-                'amount': amount - user_ingredients[name]['quantity'],
-                'unit': unit
+                'amount': missing_amount,
+                'unit': ingredient.get('unit', '')
             })
     
     return render_template('recipe/detail.html', 
@@ -155,30 +186,31 @@ def complete(recipe_id):
 @recipe_bp.route('/completed')
 @login_required
 def completed():
-    completed_recipes = CompletedRecipe.get_by_user(current_user.id)
-    return render_template('recipe/completed.html', completed_recipes=completed_recipes)
+    before = CompletedRecipe.decode_cursor(request.args.get('before'))
+    
+    # Fetch one extra row to know whether an older page exists
+    completed_recipes = CompletedRecipe.get_by_user(current_user.id, limit=COMPLETED_PAGE_SIZE + 1, before=before)
+    
+    next_cursor = None
+    if len(completed_recipes) > COMPLETED_PAGE_SIZE:
+        completed_recipes = completed_recipes[:COMPLETED_PAGE_SIZE]
+        next_cursor = CompletedRecipe.encode_cursor(completed_recipes[-1])
+    
+    return render_template('recipe/completed.html', 
+                          completed_recipes=completed_recipes,
+                          next_cursor=next_cursor)
 
 @recipe_bp.route('/api/can-make', methods=['GET'])
 @login_required
 def api_can_make():
     # Get user's inventory ingredients
-    inventory_items = Inventory.get_by_user_id(current_user.id)
-    ingredient_names = [item.ingredient_name for item in inventory_items]
-    
-    # Get recipes that can be made with these ingredients
-    recipes = Recipe.search_by_ingredients(ingredient_names)
-    
-    # Format for JSON response
-    recipes_list = []
-    for recipe in recipes:
-        recipes_list.append({
-            'id': str(recipe['_id']),
-            'name': recipe['name'],
-            'match_percentage': recipe.get('match_percentage', 0)
-        })
-    
-    return jsonify({'recipes': recipes_list})
-
-
-
-
+    inventory = Inventory.snapshot(current_user.id)
+    
+    # Rank on the ingredient index; this endpoint needs no full documents
+    recipes_list = Inventory.memoize(
+        current_user.id,
+        ('recipe.api_can_make', Recipe.generation()),
+        lambda: Recipe.match_ingredients(inventory.names)
+    )
+    
+    return jsonify({'recipes': recipes_list})
\ No newline at end of file